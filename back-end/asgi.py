@@ -0,0 +1,560 @@
+# asgi.py
+#
+# ASGI variant of the API, for serving many concurrent (and slow) clients
+# without a thread per connection:
+#
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000
+#
+# Routes and JSON contracts match backend.py, so the React client works
+# against either server. Account and pantry listing queries run on a small
+# pool of aiosqlite connections. Handlers that rank or cache recipes reuse
+# the recipes_db / ingredients_db functions (and the in-process ingredient
+# index, caches and suggestion state behind them) on Starlette's thread
+# pool, so a request only occupies a thread while it is actually querying.
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import aiosqlite
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette import responses as starlette_responses
+from starlette.responses import Response
+from starlette.routing import Route
+
+import ingredient_vocabulary
+import ingredients_db
+import metrics
+import responses
+import write_behind
+from backend import (
+    MAX_PAGE_SIZE, is_valid_email, parse_fields, parse_id_list, parse_page_args, parse_recipe_id, parse_since,
+    warm_up
+)
+from db import BUSY_TIMEOUT, DB_PATH, POOL_SIZE, PRAGMAS
+from recipes_db import (
+    get_recipe_suggestions, find_recipes_by_ingredients, get_recipe_by_id, get_recipes_by_ids, search_recipes,
+    add_favorite_recipe, get_favorite_recipes, remove_favorite_recipe,
+    get_favorite_ids, get_favorite_statuses,
+    catalog_version, DEFAULT_SUGGESTION_LIMIT, FAVORITE_FIELDS, RECIPE_FIELDS
+)
+
+logger = logging.getLogger(__name__)
+
+class JSONResponse(starlette_responses.JSONResponse):
+    """JSON response encoded like the Flask app's (orjson when installed)."""
+
+    def render(self, content):
+        return responses.dumps(content)
+
+# Idle aiosqlite connections; each one owns a background thread
+_connections = None
+
+async def open_connections(size=POOL_SIZE):
+    global _connections
+    _connections = asyncio.Queue()
+    for _ in range(size):
+        conn = await aiosqlite.connect(DB_PATH, timeout=BUSY_TIMEOUT)
+        conn.row_factory = aiosqlite.Row
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        _connections.put_nowait(conn)
+
+async def close_connections():
+    while not _connections.empty():
+        conn = _connections.get_nowait()
+        await conn.close()
+
+@asynccontextmanager
+async def connection():
+    """Borrow a pooled aiosqlite connection, waiting if all are in use."""
+    conn = await _connections.get()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            await conn.rollback()
+        _connections.put_nowait(conn)
+
+async def fetchone(query, params=()):
+    async with connection() as conn:
+        async with conn.execute(query, params) as cursor:
+            return await cursor.fetchone()
+
+def query_arg(params, name, default, type):
+    """Like Flask's request.args.get(name, default, type): bad values fall back to the default."""
+    try:
+        return type(params[name])
+    except (KeyError, ValueError):
+        return default
+
+def error(message, status_code):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+def database_error(e):
+    return error(f"Database error occurred: {str(e)}", 500)
+
+def catalog_response(request, payload, catalog):
+    """Async counterpart of backend.catalog_response()."""
+    version, last_modified = catalog
+    etag = f'"catalog-{version}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified.strftime('%a, %d %b %Y %H:%M:%S GMT'),
+        "Cache-Control": "no-cache"
+    }
+    if etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(payload, headers=headers)
+
+async def signup(request):
+    data = await request.json()
+    username = data.get('username')
+    email = data.get('email')
+    password = data.get('password')
+
+    if not username or not password or not email:
+        return error("Username, email, and password are required", 400)
+
+    if not is_valid_email(email):
+        return error("Invalid email format", 400)
+
+    try:
+        async with connection() as conn:
+            async with conn.execute("SELECT username FROM users WHERE username = ?", (username,)) as cursor:
+                if await cursor.fetchone():
+                    return error("Username already exists", 400)
+
+            async with conn.execute("SELECT email FROM users WHERE email = ?", (email,)) as cursor:
+                if await cursor.fetchone():
+                    return error("Email already exists", 400)
+
+            await conn.execute("INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+                               (username, email, password))
+            await conn.commit()
+
+        logger.info(f"User '{username}' created successfully")
+        return JSONResponse({"message": "User created successfully", "username": username})
+    except Exception as e:
+        logger.error(f"Database error during signup: {e}", exc_info=True)
+        return database_error(e)
+
+async def login(request):
+    data = await request.json()
+    username = data.get('username')
+    password = data.get('password')
+
+    if not username or not password:
+        return error("Username and password are required", 400)
+
+    try:
+        user = await fetchone("SELECT username, password FROM users WHERE username = ?", (username,))
+        if user and user['password'] == password:
+            return JSONResponse({"message": "Login successful", "username": username})
+
+        logger.warning(f"Login failed for user '{username}': Invalid credentials")
+        return error("Invalid credentials", 401)
+    except Exception as e:
+        logger.error(f"Database error during login: {e}", exc_info=True)
+        return database_error(e)
+
+async def get_ingredients(request):
+    username = request.query_params.get('username')
+
+    if not username:
+        return error("Username is required", 400)
+
+    try:
+        after_id, limit = parse_page_args(request.query_params)
+        fields = parse_fields(request.query_params.get('fields'), ingredients_db.INGREDIENT_FIELDS)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    try:
+        query, params, columns = ingredients_db.ingredients_page_query(username, after_id, limit, fields)
+        # Before the query, so a flush committing meanwhile is not missed
+        pending = write_behind.pending(username)
+        async with connection() as conn:
+            async with conn.execute(query, params) as cursor:
+                rows = [tuple(row) for row in await cursor.fetchall()]
+            async with conn.execute(ingredients_db.COUNT_INGREDIENTS_SQL, (username,)) as cursor:
+                total = (await cursor.fetchone())[0]
+
+        ingredients, next_after_id = ingredients_db.ingredients_page_result(
+            rows, columns, fields, limit, pending
+        )
+        return JSONResponse({"ingredients": ingredients, "total": total, "next_after_id": next_after_id})
+    except Exception as e:
+        logger.error(f"Error getting ingredients: {e}", exc_info=True)
+        return database_error(e)
+
+async def get_ingredient_changes(request):
+    username = request.query_params.get('username')
+
+    if not username:
+        return error("Username is required", 400)
+
+    try:
+        since = parse_since(request.query_params.get('since'))
+    except ValueError as e:
+        return error(str(e), 400)
+
+    try:
+        return JSONResponse(await run_in_threadpool(ingredients_db.get_pantry_changes, username, since))
+    except Exception as e:
+        logger.error(f"Error getting ingredient changes: {e}", exc_info=True)
+        return database_error(e)
+
+async def autocomplete_ingredients(request):
+    params = request.query_params
+    prefix = params.get('prefix')
+    limit = query_arg(params, 'limit', ingredient_vocabulary.DEFAULT_LIMIT, int)
+
+    if prefix is None:
+        return error("prefix is required", 400)
+
+    if limit < 1:
+        return error("limit must be positive", 400)
+
+    try:
+        catalog = await run_in_threadpool(catalog_version)
+        suggestions = ingredient_vocabulary.complete(prefix, min(limit, ingredient_vocabulary.MAX_LIMIT))
+        return catalog_response(request, {"suggestions": suggestions}, catalog)
+    except Exception as e:
+        logger.error(f"Error completing ingredients: {e}", exc_info=True)
+        return database_error(e)
+
+async def add_ingredients(request):
+    data = await request.json()
+    username = data.get('username')
+    ingredients = data.get('ingredients', [])
+    only_changed = bool(data.get('only_changed', False))
+
+    if not username:
+        return error("Username is required", 400)
+
+    if not ingredients:
+        return error("No ingredients provided", 400)
+
+    items = ingredients_db.parse_ingredient_items(ingredients)
+    if any(not isinstance(name, str) or not name.strip() for name, _ in items):
+        return error("Ingredient names must be non-empty strings", 400)
+
+    try:
+        if not await fetchone("SELECT username FROM users WHERE username = ?", (username,)):
+            return error("User not found", 404)
+
+        added = await run_in_threadpool(ingredients_db.add_ingredients, username, items)
+        names = [name for name, _ in items] if only_changed else None
+        updated_ingredients = await run_in_threadpool(ingredients_db.get_ingredients, username, names)
+
+        return JSONResponse({
+            "message": "Ingredients added successfully",
+            "added": added,
+            "ingredients": updated_ingredients
+        })
+    except Exception as e:
+        logger.error(f"Error adding ingredients: {e}", exc_info=True)
+        return database_error(e)
+
+async def update_ingredient_status(request):
+    data = await request.json()
+    username = data.get('username')
+    ingredients = data.get('ingredients', [])
+
+    if not username or not ingredients:
+        return error("Username and ingredients are required", 400)
+
+    try:
+        items = ingredients_db.parse_ingredient_items(
+            [ingredient for ingredient in ingredients if isinstance(ingredient, dict)]
+        )
+        if items:
+            await run_in_threadpool(ingredients_db.update_ingredient_status, username, items)
+
+        return JSONResponse({"message": "Ingredients updated successfully"})
+    except Exception as e:
+        logger.error(f"Error updating ingredients: {e}", exc_info=True)
+        return database_error(e)
+
+async def remove_ingredient(request):
+    data = await request.json()
+    username = data.get('username')
+    ingredient = data.get('ingredient')
+
+    if not username or not ingredient:
+        return error("Username and ingredient are required", 400)
+
+    try:
+        await run_in_threadpool(ingredients_db.remove_ingredient, username, ingredient)
+        return JSONResponse({"message": "Ingredient removed successfully"})
+    except Exception as e:
+        logger.error(f"Error removing ingredient: {e}", exc_info=True)
+        return database_error(e)
+
+async def chat_recipes(request):
+    data = await request.json()
+    ingredients = data.get('ingredients', [])
+
+    if not ingredients:
+        return error("Please provide ingredients", 400)
+
+    try:
+        limit = int(data.get('limit', 5))
+        offset = int(data.get('offset', 0))
+    except (TypeError, ValueError):
+        return error("limit and offset must be integers", 400)
+
+    if limit < 1 or offset < 0:
+        return error("limit must be positive and offset non-negative", 400)
+
+    try:
+        response_format = responses.parse_format(data.get('format'))
+    except ValueError as e:
+        return error(str(e), 400)
+
+    try:
+        await run_in_threadpool(catalog_version)
+        ingredients, corrections = ingredient_vocabulary.correct_terms(ingredients)
+        recipes = await run_in_threadpool(
+            find_recipes_by_ingredients, ingredients, min(limit, MAX_PAGE_SIZE), offset
+        )
+        return JSONResponse(responses.recipe_list_payload(recipes, response_format, corrections=corrections))
+    except Exception as e:
+        logger.error(f"Error in chat_recipes: {e}", exc_info=True)
+        return error(str(e), 500)
+
+async def suggest_recipes(request):
+    params = request.query_params
+    username = params.get('username')
+
+    if not username:
+        return error("Username is required", 400)
+
+    threshold = query_arg(params, 'threshold', 0.5, float)
+    limit = query_arg(params, 'limit', DEFAULT_SUGGESTION_LIMIT, int)
+
+    if limit < 1:
+        return error("limit must be positive", 400)
+
+    try:
+        response_format = responses.parse_format(params.get('format'))
+        suggestions, next_cursor = await run_in_threadpool(
+            get_recipe_suggestions, username, threshold, min(limit, MAX_PAGE_SIZE),
+            params.get('cursor'), params.get('sort', 'match'), params.get('engine')
+        )
+        return JSONResponse(responses.recipe_list_payload(suggestions, response_format, next_cursor=next_cursor))
+    except ValueError as e:
+        return error(str(e), 400)
+    except Exception as e:
+        logger.error(f"Error suggesting recipes: {e}", exc_info=True)
+        return database_error(e)
+
+async def get_recipe(request):
+    recipe_id = request.path_params['recipe_id']
+    try:
+        catalog = await run_in_threadpool(catalog_version)
+        recipe = await run_in_threadpool(get_recipe_by_id, recipe_id)
+        if recipe:
+            return catalog_response(request, {"recipe": recipe}, catalog)
+        return error("Recipe not found", 404)
+    except Exception as e:
+        logger.error(f"Error getting recipe: {e}", exc_info=True)
+        return database_error(e)
+
+async def get_recipes_batch(request):
+    try:
+        recipe_ids = parse_id_list(request.query_params.get('ids'))
+        fields = parse_fields(request.query_params.get('fields'), RECIPE_FIELDS)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    if not recipe_ids:
+        return error("ids is required", 400)
+
+    try:
+        catalog = await run_in_threadpool(catalog_version)
+        recipes, missing = await run_in_threadpool(get_recipes_by_ids, recipe_ids, fields)
+        return catalog_response(request, {"recipes": recipes, "missing": missing}, catalog)
+    except Exception as e:
+        logger.error(f"Error getting recipes: {e}", exc_info=True)
+        return database_error(e)
+
+async def search_recipe(request):
+    params = request.query_params
+    query = params.get('query', '')
+
+    if not query:
+        return error("Search query is required", 400)
+
+    limit = query_arg(params, 'limit', 20, int)
+    offset = query_arg(params, 'offset', 0, int)
+
+    if limit < 1 or offset < 0:
+        return error("limit must be positive and offset non-negative", 400)
+
+    try:
+        catalog = await run_in_threadpool(catalog_version)
+        recipes = await run_in_threadpool(search_recipes, query, min(limit, MAX_PAGE_SIZE), offset)
+        return catalog_response(request, {"recipes": recipes}, catalog)
+    except Exception as e:
+        logger.error(f"Error searching recipes: {e}", exc_info=True)
+        return database_error(e)
+
+async def favorite_recipe(request):
+    data = await request.json()
+    username = data.get('username')
+    recipe_id = parse_recipe_id(data.get('recipe_id'))
+
+    if not username or not recipe_id:
+        return error("Username and a numeric recipe_id are required", 400)
+
+    if request.method == 'POST':
+        change, done, failed = add_favorite_recipe, "Recipe added to favorites", "Failed to add recipe to favorites"
+    else:
+        change, done, failed = remove_favorite_recipe, "Recipe removed from favorites", "Failed to remove recipe from favorites"
+
+    try:
+        if await run_in_threadpool(change, username, recipe_id):
+            return JSONResponse({"message": done})
+        return error(failed, 500)
+    except Exception as e:
+        logger.error(f"Error changing favorite recipe: {e}", exc_info=True)
+        return database_error(e)
+
+async def get_favorite_status(request):
+    recipe_id = request.path_params['recipe_id']
+    username = request.query_params.get('username')
+
+    if not username:
+        return error("Username is required", 400)
+
+    try:
+        favorite_ids = await run_in_threadpool(get_favorite_ids, username)
+        return JSONResponse({"recipe_id": recipe_id, "favorite": recipe_id in favorite_ids})
+    except Exception as e:
+        logger.error(f"Error checking favorite status: {e}", exc_info=True)
+        return database_error(e)
+
+async def get_favorite_statuses_route(request):
+    username = request.query_params.get('username')
+
+    if not username:
+        return error("Username is required", 400)
+
+    try:
+        recipe_ids = parse_id_list(request.query_params.get('ids'))
+    except ValueError as e:
+        return error(str(e), 400)
+
+    try:
+        statuses = await run_in_threadpool(get_favorite_statuses, username, recipe_ids)
+        return JSONResponse({"favorites": {str(recipe_id): favorite for recipe_id, favorite in statuses.items()}})
+    except Exception as e:
+        logger.error(f"Error checking favorite statuses: {e}", exc_info=True)
+        return database_error(e)
+
+async def get_favorites_route(request):
+    username = request.query_params.get('username')
+
+    if not username:
+        return error("Username is required", 400)
+
+    try:
+        after_id, limit = parse_page_args(request.query_params)
+        fields = parse_fields(request.query_params.get('fields'), FAVORITE_FIELDS)
+    except ValueError as e:
+        return error(str(e), 400)
+
+    try:
+        recipes, next_after_id = await run_in_threadpool(get_favorite_recipes, username, after_id, limit, fields)
+        favorite_ids = await run_in_threadpool(get_favorite_ids, username)
+        return JSONResponse({"recipes": recipes, "total": len(favorite_ids), "next_after_id": next_after_id})
+    except Exception as e:
+        logger.error(f"Error getting favorite recipes: {e}", exc_info=True)
+        return database_error(e)
+
+async def get_metrics(request):
+    return Response(metrics.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+class MetricsMiddleware:
+    """
+    ASGI counterpart of the request metrics hooks in backend.py. Statements
+    run on the aiosqlite connections are not seen by the SQL counters.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        token = metrics.start_request()
+        status = [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched endpoint in the scope
+            route = ROUTE_PATHS.get(scope.get('endpoint'), 'unmatched')
+            metrics.finish_request(token, scope['method'], route, status[0])
+
+@asynccontextmanager
+async def lifespan(app):
+    # Same one-time startup work as the Flask app
+    await run_in_threadpool(warm_up)
+    await open_connections()
+    yield
+    # Buffered pantry toggles are written before the pool goes away
+    await run_in_threadpool(write_behind.shutdown)
+    await close_connections()
+
+routes = [
+    Route('/api/signup', signup, methods=['POST']),
+    Route('/api/login', login, methods=['POST']),
+    Route('/api/ingredients', get_ingredients, methods=['GET']),
+    Route('/api/ingredients/changes', get_ingredient_changes, methods=['GET']),
+    Route('/api/ingredients/autocomplete', autocomplete_ingredients, methods=['GET']),
+    Route('/api/add_ingredients', add_ingredients, methods=['POST']),
+    Route('/api/update_ingredient_status', update_ingredient_status, methods=['POST']),
+    Route('/api/remove_ingredient', remove_ingredient, methods=['POST']),
+    Route('/api/chat/recipes', chat_recipes, methods=['POST']),
+    Route('/api/recipes/suggest', suggest_recipes, methods=['GET']),
+    Route('/api/recipes/search', search_recipe, methods=['GET']),
+    Route('/api/recipes/favorite', favorite_recipe, methods=['POST', 'DELETE']),
+    Route('/api/recipes/favorites', get_favorites_route, methods=['GET']),
+    Route('/api/recipes/favorites/status', get_favorite_statuses_route, methods=['GET']),
+    Route('/api/recipes/batch', get_recipes_batch, methods=['GET']),
+    Route('/api/recipes/{recipe_id:int}', get_recipe, methods=['GET']),
+    Route('/api/recipes/{recipe_id:int}/favorite', get_favorite_status, methods=['GET']),
+    Route('/api/metrics', get_metrics, methods=['GET']),
+]
+
+# Route pattern per endpoint, used as the metrics label
+ROUTE_PATHS = {route.endpoint: route.path for route in routes}
+
+app = Starlette(
+    routes=routes,
+    lifespan=lifespan,
+    middleware=[
+        Middleware(MetricsMiddleware),
+        Middleware(GZipMiddleware, minimum_size=responses.COMPRESSION_MIN_BYTES),
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+    ],
+)
@@ -1,13 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, g, request, jsonify
 from flask_cors import CORS
+import click
 import sqlite3
 import logging
 import re
 import os
 import sys
+import time
+from cache import cache_stats
+from db import DB_PATH, get_connection, release_thread_connection
+from migration import LATEST_VERSION, get_schema_version, migrate_database
+import ingredient_vocabulary
+import ingredients_db
+import metrics
+import responses
+from recipe_import import DEFAULT_BATCH_SIZE as DEFAULT_IMPORT_BATCH_SIZE, detect_format, import_stream
 from recipes_db import (
-    get_recipe_suggestions, get_recipe_by_id, search_recipes,
-    add_favorite_recipe, get_favorite_recipes, remove_favorite_recipe, init_recipe_db
+    get_recipe_suggestions, find_recipes_by_ingredients, get_recipe_by_id, get_recipes_by_ids, search_recipes,
+    add_favorite_recipe, get_favorite_recipes, remove_favorite_recipe, init_recipe_db,
+    get_favorite_ids, get_favorite_statuses,
+    catalog_version, refresh_catalog, DEFAULT_SUGGESTION_LIMIT, FAVORITE_FIELDS, RECIPE_FIELDS
 )
 
 # Set up logging
@@ -15,37 +27,155 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-# Configure CORS to allow requests from your React development server
-CORS(app, resources={r"/api/*": {"origins": ["http://localhost:3000", "http://127.0.0.1:3000"]}}, supports_credentials=True)
-
-# Initialize databases
-# init_db()  # Initialize ingredients database
-init_recipe_db()  # Initialize recipe database
+# All routes and CLI commands live on this blueprint; create_app() builds the application
+api = Blueprint('api', __name__, cli_group=None)
 
 # Add error handler for 500 errors
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def handle_500_error(e):
     logger.error(f"500 error: {str(e)}", exc_info=True)
     return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
+# Shared secret for /api/recipes/import (X-Import-Token header); unset disables the endpoint
+IMPORT_TOKEN = os.environ.get('FOOD_PLANNER_IMPORT_TOKEN')
+
+# Skip the write probe, seeding and diagnostics at startup and only check
+# that the schema is current; set up the database with `flask init-db`
+FAST_START = os.environ.get('FOOD_PLANNER_FAST_START') == '1'
+
+# Upper bound for client-supplied page sizes
+MAX_PAGE_SIZE = 100
+
+# Upper bound for the number of ids in one batch lookup
+MAX_BATCH_IDS = 500
+
 # Email validation regex
 EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
 
 # Database setup with improved error handling
 def get_db_connection():
-    # Use absolute path for better reliability
-    db_path = os.path.abspath('food_planner.db')
+    # Connections come from the shared pool in db.py; close() returns them
     try:
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return get_connection()
     except sqlite3.Error as e:
-        logger.error(f"Database connection error with path {db_path}: {e}", exc_info=True)
+        logger.error(f"Database connection error with path {DB_PATH}: {e}", exc_info=True)
         raise Exception(f"Failed to connect to database: {e}")
 
+@api.before_app_request
+def start_request_metrics():
+    g.metrics_token = metrics.start_request()
+
+@api.after_app_request
+def record_request_metrics(response):
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.finish_request(token, request.method, route, response.status_code)
+    return response
+
+@api.after_app_request
+def compress_response(response):
+    return responses.compress_response(response, request.accept_encodings)
+
+@api.teardown_app_request
+def release_db_connection(exc):
+    # Hand back connections left open by handlers that failed half way
+    release_thread_connection()
+
+def parse_recipe_id(value):
+    """Recipe id from a JSON body (int or numeric string), or None if invalid."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+def parse_fields(value, allowed):
+    """
+    Parse a ``fields=a,b`` projection parameter.
+    
+    Returns:
+        Tuple of field names, or ``allowed`` when the parameter is absent
+        
+    Raises:
+        ValueError: If a field is not in ``allowed``
+    """
+    if not value:
+        return allowed
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return fields
+
+def parse_id_list(value):
+    """
+    Parse an ``ids=1,2,3`` parameter.
+    
+    Raises:
+        ValueError: If an id is not an integer or there are more than MAX_BATCH_IDS
+    """
+    try:
+        recipe_ids = [int(recipe_id) for recipe_id in (value or '').split(',') if recipe_id.strip()]
+    except ValueError:
+        raise ValueError("ids must be a comma separated list of recipe ids")
+    if len(recipe_ids) > MAX_BATCH_IDS:
+        raise ValueError(f"At most {MAX_BATCH_IDS} ids can be requested at once")
+    return recipe_ids
+
+def parse_since(value):
+    """
+    Parse the ``since`` version of a changes request (0 when absent).
+    
+    Raises:
+        ValueError: If it is not a non-negative integer
+    """
+    if value is None or value == '':
+        return 0
+    try:
+        since = int(value)
+    except ValueError:
+        raise ValueError("since must be a non-negative integer")
+    if since < 0:
+        raise ValueError("since must be a non-negative integer")
+    return since
+
+def parse_page_args(args):
+    """
+    Read ``after_id`` and ``limit`` from query parameters.
+    
+    Raises:
+        ValueError: If either is not a valid number
+    """
+    after_id = args.get('after_id')
+    limit = args.get('limit')
+    try:
+        after_id = int(after_id) if after_id else None
+        limit = int(limit) if limit else None
+    except ValueError:
+        raise ValueError("after_id and limit must be integers")
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be positive")
+    return after_id, min(limit, MAX_PAGE_SIZE) if limit is not None else None
+
+def catalog_response(payload, catalog):
+    """
+    JSON response for data derived only from the recipe catalog.
+    
+    The ETag and Last-Modified come from the catalog version read before the
+    data was fetched, so clients revalidating an unchanged catalog get a 304.
+    """
+    version, last_modified = catalog
+    response = jsonify(payload)
+    response.set_etag(f"catalog-{version}")
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 def ensure_db_exists():
-    db_path = 'food_planner.db'
+    db_path = DB_PATH
     db_dir = os.path.dirname(os.path.abspath(db_path)) if os.path.dirname(db_path) else '.'
     
     logger.info(f"Current working directory: {os.getcwd()}")
@@ -101,7 +231,7 @@ def ensure_db_exists():
         return False
 
 def check_db_status():
-    db_path = 'food_planner.db'
+    db_path = DB_PATH
     
     if os.path.exists(db_path):
         file_size = os.path.getsize(db_path)
@@ -129,61 +259,131 @@ def check_db_status():
 
 def init_db():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Create users table with email field
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Create ingredients table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS ingredients (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            name TEXT NOT NULL,
-            checked BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (username) REFERENCES users (username)
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        # Create the schema or bring it up to date
+        migrate_database()
         logger.info("Database initialized successfully")
         return True
     except Exception as e:
         logger.error(f"Database initialization error: {e}", exc_info=True)
         return False
 
-# Check database before initializing
-if not ensure_db_exists():
-    logger.error("Critical error: Cannot create or access database")
-    sys.exit(1)  # Exit the application if we can't access the database
+def check_schema():
+    """
+    Fast-start check that the database exists and is fully migrated.
+    
+    Returns:
+        True if the schema is at LATEST_VERSION
+    """
+    if not os.path.exists(DB_PATH):
+        logger.error(f"Database file does not exist: {DB_PATH}")
+        return False
+    
+    conn = get_db_connection()
+    try:
+        version = get_schema_version(conn)
+    finally:
+        conn.close()
+    
+    if version != LATEST_VERSION:
+        logger.error(f"Database schema is at version {version}, expected {LATEST_VERSION}")
+        return False
+    return True
+
+def prepare_db():
+    """Check the database file, apply migrations and seed the sample catalog."""
+    # Check database before initializing
+    if not ensure_db_exists():
+        logger.error("Critical error: Cannot create or access database")
+        sys.exit(1)  # Exit the application if we can't access the database
+    
+    # Initialize database on startup
+    if not init_db():
+        logger.error("Failed to initialize database schema")
+        sys.exit(1)
+    
+    # Seed sample recipes and build the in-memory recipe index
+    init_recipe_db()
 
-# Initialize database on startup
-if not init_db():
-    logger.error("Failed to initialize database schema")
-    sys.exit(1)
+def warm_up(fast=FAST_START):
+    """
+    One-time startup work: make sure the database is usable and build the
+    in-memory recipe index.
+    
+    Under a pre-fork server this runs once in the master process and the
+    workers inherit the result.
+    
+    Args:
+        fast: Only check the schema version instead of probing, migrating
+            and seeding; the database must have been set up with
+            `flask init-db`
+    """
+    started = time.perf_counter()
+    
+    if fast:
+        if not check_schema():
+            logger.error("Run `flask --app 'backend:create_app(warm=False)' init-db` first")
+            sys.exit(1)
+        refresh_catalog()
+    else:
+        prepare_db()
+        
+        # Check database status after initialization
+        check_db_status()
+    
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"Startup finished in {elapsed_ms:.0f} ms ({'fast' if fast else 'full'} start)")
 
-# Check database status after initialization
-check_db_status()
+@api.cli.command('init-db')
+def init_db_command():
+    """Create or migrate the database and seed the sample recipes."""
+    prepare_db()
+    click.echo(f"Database ready at {DB_PATH} (schema version {LATEST_VERSION})")
+
+@api.cli.command('db-status')
+def db_status_command():
+    """Print database file, table and schema version diagnostics."""
+    if not check_db_status():
+        sys.exit(1)
+    conn = get_db_connection()
+    try:
+        version = get_schema_version(conn)
+    finally:
+        conn.close()
+    click.echo(f"Schema version {version} (latest {LATEST_VERSION})")
+    if version != LATEST_VERSION:
+        sys.exit(1)
+
+@api.cli.command('compact-pantry-log')
+def compact_pantry_log_command():
+    """Compact every user's pantry change log."""
+    users = ingredients_db.compact_all_pantry_changes()
+    click.echo(f"Compacted the pantry change log of {users} users")
+
+def create_app(warm=True):
+    """
+    Build the Flask application.
+    
+    Args:
+        warm: Run warm_up() first; pass False if the process already did
+    """
+    if warm:
+        warm_up()
+    
+    app = Flask(__name__)
+    app.json = responses.FastJSONProvider(app)
+    # Configure CORS to allow requests from your React development server
+    CORS(app, resources={r"/api/*": {"origins": ["http://localhost:3000", "http://127.0.0.1:3000"]}}, supports_credentials=True)
+    app.register_blueprint(api)
+    return app
 
 # Helper function to validate email
 def is_valid_email(email):
     return EMAIL_REGEX.match(email) is not None
 
 # API Routes
-@app.route('/api/signup', methods=['POST'])
+@api.route('/api/signup', methods=['POST'])
 def signup():
     data = request.json
-    logger.info(f"Signup request received: {data}")
 
     username = data.get('username')
     email = data.get('email')
@@ -228,10 +428,9 @@ def signup():
         logger.error(f"Database error during signup: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 def login():
     data = request.json
-    logger.info(f"Login request received: {data}")
     
     username = data.get('username')
     password = data.get('password')
@@ -258,7 +457,7 @@ def login():
         logger.error(f"Database error during login: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 
-@app.route('/api/ingredients', methods=['GET'])
+@api.route('/api/ingredients', methods=['GET'])
 def get_ingredients():
     username = request.args.get('username')
     
@@ -266,35 +465,66 @@ def get_ingredients():
         return jsonify({"error": "Username is required"}), 400
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, name, checked FROM ingredients WHERE username = ? ORDER BY created_at DESC", 
-            (username,)
-        )
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        ingredients = []
-        for row in rows:
-            ingredients.append({
-                "id": row['id'],
-                "name": row['name'],
-                "checked": bool(row['checked'])
-            })
-        
-        return jsonify({"ingredients": ingredients})
+        after_id, limit = parse_page_args(request.args)
+        fields = parse_fields(request.args.get('fields'), ingredients_db.INGREDIENT_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        ingredients, next_after_id = ingredients_db.get_ingredients_page(username, after_id, limit, fields)
+        return jsonify({
+            "ingredients": ingredients,
+            "total": ingredients_db.count_ingredients(username),
+            "next_after_id": next_after_id
+        })
     except Exception as e:
         logger.error(f"Error getting ingredients: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 
-@app.route('/api/add_ingredients', methods=['POST'])
+@api.route('/api/ingredients/changes', methods=['GET'])
+def get_ingredient_changes():
+    username = request.args.get('username')
+    
+    if not username:
+        return jsonify({"error": "Username is required"}), 400
+    
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        return jsonify(ingredients_db.get_pantry_changes(username, since))
+    except Exception as e:
+        logger.error(f"Error getting ingredient changes: {e}", exc_info=True)
+        return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
+
+@api.route('/api/ingredients/autocomplete', methods=['GET'])
+def autocomplete_ingredients():
+    prefix = request.args.get('prefix')
+    limit = request.args.get('limit', default=ingredient_vocabulary.DEFAULT_LIMIT, type=int)
+    
+    if prefix is None:
+        return jsonify({"error": "prefix is required"}), 400
+    
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+    
+    try:
+        catalog = catalog_version()
+        suggestions = ingredient_vocabulary.complete(prefix, min(limit, ingredient_vocabulary.MAX_LIMIT))
+        return catalog_response({"suggestions": suggestions}, catalog)
+    except Exception as e:
+        logger.error(f"Error completing ingredients: {e}", exc_info=True)
+        return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
+
+@api.route('/api/add_ingredients', methods=['POST'])
 def add_ingredients():
     data = request.json
     username = data.get('username')
     ingredients = data.get('ingredients', [])
+    # Pantry imports can ask for just the submitted rows instead of the whole pantry
+    only_changed = bool(data.get('only_changed', False))
     
     if not username:
         return jsonify({"error": "Username is required"}), 400
@@ -302,58 +532,38 @@ def add_ingredients():
     if not ingredients:
         return jsonify({"error": "No ingredients provided"}), 400
     
+    items = ingredients_db.parse_ingredient_items(ingredients)
+    if any(not isinstance(name, str) or not name.strip() for name, _ in items):
+        return jsonify({"error": "Ingredient names must be non-empty strings"}), 400
+    
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
         # Verify user exists
         cursor.execute("SELECT username FROM users WHERE username = ?", (username,))
-        if not cursor.fetchone():
-            conn.close()
+        user = cursor.fetchone()
+        conn.close()
+        if not user:
             return jsonify({"error": "User not found"}), 404
         
-        # Add ingredients
-        for ingredient in ingredients:
-            if isinstance(ingredient, dict):
-                name = ingredient.get('name')
-                checked = ingredient.get('checked', False)
-            else:
-                name = ingredient
-                checked = False
-                
-            cursor.execute(
-                "INSERT INTO ingredients (username, name, checked) VALUES (?, ?, ?)",
-                (username, name, checked)
-            )
-        
-        conn.commit()
-        
-        # Get updated ingredients list
-        cursor.execute(
-            "SELECT id, name, checked FROM ingredients WHERE username = ? ORDER BY created_at DESC", 
-            (username,)
-        )
-        
-        rows = cursor.fetchall()
-        conn.close()
+        added = ingredients_db.add_ingredients(username, items)
         
-        updated_ingredients = []
-        for row in rows:
-            updated_ingredients.append({
-                "id": row['id'],
-                "name": row['name'],
-                "checked": bool(row['checked'])
-            })
+        if only_changed:
+            updated_ingredients = ingredients_db.get_ingredients(username, [name for name, _ in items])
+        else:
+            updated_ingredients = ingredients_db.get_ingredients(username)
         
         return jsonify({
             "message": "Ingredients added successfully",
+            "added": added,
             "ingredients": updated_ingredients
         })
     except Exception as e:
         logger.error(f"Error adding ingredients: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 
-@app.route('/api/update_ingredient_status', methods=['POST'])
+@api.route('/api/update_ingredient_status', methods=['POST'])
 def update_ingredient_status():
     data = request.json
     username = data.get('username')
@@ -363,28 +573,19 @@ def update_ingredient_status():
         return jsonify({"error": "Username and ingredients are required"}), 400
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        for ingredient in ingredients:
-            if isinstance(ingredient, dict):
-                name = ingredient.get('name')
-                checked = ingredient.get('checked', False)
-                
-                cursor.execute(
-                    "UPDATE ingredients SET checked = ? WHERE username = ? AND name = ?",
-                    (checked, username, name)
-                )
-        
-        conn.commit()
-        conn.close()
+        # Only {"name", "checked"} objects carry a status
+        items = ingredients_db.parse_ingredient_items(
+            [ingredient for ingredient in ingredients if isinstance(ingredient, dict)]
+        )
+        if items:
+            ingredients_db.update_ingredient_status(username, items)
         
         return jsonify({"message": "Ingredients updated successfully"})
     except Exception as e:
         logger.error(f"Error updating ingredients: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 
-@app.route('/api/remove_ingredient', methods=['POST'])
+@api.route('/api/remove_ingredient', methods=['POST'])
 def remove_ingredient():
     data = request.json
     username = data.get('username')
@@ -394,23 +595,13 @@ def remove_ingredient():
         return jsonify({"error": "Username and ingredient are required"}), 400
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "DELETE FROM ingredients WHERE username = ? AND name = ?",
-            (username, ingredient)
-        )
-        
-        conn.commit()
-        conn.close()
-        
+        ingredients_db.remove_ingredient(username, ingredient)
         return jsonify({"message": "Ingredient removed successfully"})
     except Exception as e:
         logger.error(f"Error removing ingredient: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 # Adding ingrediants
-@app.route('/api/chat/recipes', methods=['POST'])
+@api.route('/api/chat/recipes', methods=['POST'])
 def chat_recipes():
     data = request.json
     ingredients = data.get('ingredients', [])
@@ -420,60 +611,37 @@ def chat_recipes():
         return jsonify({"error": "Please provide ingredients"}), 400
     
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Convert ingredients to lowercase for case-insensitive matching
-        ingredients_lower = [i.lower() for i in ingredients]
-        
-        # Find recipes that contain any of the provided ingredients
-        placeholders = ','.join(['?'] * len(ingredients_lower))
-        query = f"""
-            SELECT r.id, r.name, r.description, r.instructions,
-                   GROUP_CONCAT(ri.ingredient) as all_ingredients,
-                   SUM(CASE WHEN LOWER(ri.ingredient) IN ({placeholders}) THEN 1 ELSE 0 END) as match_count,
-                   COUNT(ri.id) as total_ingredients
-            FROM recipes r
-            JOIN recipe_ingredients ri ON r.id = ri.recipe_id
-            GROUP BY r.id
-            HAVING match_count > 0
-            ORDER BY match_count DESC, total_ingredients ASC
-            LIMIT 5
-        """
-        
-        cursor.execute(query, ingredients_lower)
-        recipes = cursor.fetchall()
-        
-        formatted_recipes = []
-        for recipe in recipes:
-            all_ingredients = recipe['all_ingredients'].split(',')
-            matching = [i for i in all_ingredients if i.lower() in ingredients_lower]
-            missing = [i for i in all_ingredients if i.lower() not in ingredients_lower]
-            
-            formatted_recipes.append({
-                'id': recipe['id'],
-                'name': recipe['name'],
-                'description': recipe['description'],
-                'matching_ingredients': matching,
-                'missing_ingredients': missing,
-                'match_percentage': round(recipe['match_count'] / recipe['total_ingredients'], 2),
-                'instructions': recipe['instructions'].split('\n') if recipe['instructions'] else []
-            })
-        
-        conn.close()
-        return jsonify({"recipes": formatted_recipes})
+        limit = int(data.get('limit', 5))
+        offset = int(data.get('offset', 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    
+    try:
+        response_format = responses.parse_format(data.get('format'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if limit < 1 or offset < 0:
+        return jsonify({"error": "limit must be positive and offset non-negative"}), 400
+    
+    try:
+        # Keeps the vocabulary current with imports made by other processes
+        catalog_version()
+        ingredients, corrections = ingredient_vocabulary.correct_terms(ingredients)
+        recipes = find_recipes_by_ingredients(ingredients, min(limit, MAX_PAGE_SIZE), offset)
+        return jsonify(responses.recipe_list_payload(recipes, response_format, corrections=corrections))
         
     except Exception as e:
         logger.error(f"Error in chat_recipes: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 # Add a simple test route to verify the API is working
-@app.route('/api/test', methods=['GET'])
+@api.route('/api/test', methods=['GET'])
 def test_api():
     return jsonify({"message": "API is working correctly"})
 
 # Add database test endpoint
-@app.route('/api/test_db', methods=['GET'])
+@api.route('/api/test_db', methods=['GET'])
 def test_db():
     try:
         # Test database connection
@@ -504,7 +672,7 @@ def test_db():
             "tables": tables,
             "user_count": user_count,
             "ingredient_count": ingredient_count,
-            "database_path": os.path.abspath('food_planner.db')
+            "database_path": DB_PATH
         })
     except Exception as e:
         logger.error(f"Database test error: {e}", exc_info=True)
@@ -512,67 +680,149 @@ def test_db():
             "status": "error",
             "database_connected": False,
             "error": str(e),
-            "database_path": os.path.abspath('food_planner.db')
+            "database_path": DB_PATH
         }), 500
 
-@app.route('/api/db_status', methods=['GET'])
+@api.route('/api/db_status', methods=['GET'])
 def db_status():
     status = check_db_status()
     return jsonify({
-        "database_exists": os.path.exists('food_planner.db'),
+        "database_exists": os.path.exists(DB_PATH),
         "connection_successful": status,
         "working_directory": os.getcwd()
     })
 
-@app.route('/api/recipes/suggest', methods=['GET'])
+@api.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    version, last_modified = catalog_version()
+    return jsonify({
+        "catalog_version": version,
+        "catalog_updated_at": last_modified.isoformat(),
+        "caches": cache_stats()
+    })
+
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@api.route('/api/recipes/suggest', methods=['GET'])
 def suggest_recipes():
     username = request.args.get('username')
     threshold = request.args.get('threshold', default=0.5, type=float)
+    limit = request.args.get('limit', default=DEFAULT_SUGGESTION_LIMIT, type=int)
+    cursor = request.args.get('cursor')
+    sort = request.args.get('sort', default='match')
+    engine = request.args.get('engine')
     
     if not username:
         return jsonify({"error": "Username is required"}), 400
     
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+    
     try:
-        suggestions = get_recipe_suggestions(username, threshold)
-        return jsonify({"recipes": suggestions})
+        response_format = responses.parse_format(request.args.get('format'))
+        suggestions, next_cursor = get_recipe_suggestions(
+            username, threshold, min(limit, MAX_PAGE_SIZE), cursor, sort, engine
+        )
+        return jsonify(responses.recipe_list_payload(suggestions, response_format, next_cursor=next_cursor))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error(f"Error suggesting recipes: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 
-@app.route('/api/recipes/<int:recipe_id>', methods=['GET'])
+@api.route('/api/recipes/import', methods=['POST'])
+def import_recipes_route():
+    # Bulk loads are an admin operation: disabled unless a token is configured
+    if not IMPORT_TOKEN or request.headers.get('X-Import-Token') != IMPORT_TOKEN:
+        return jsonify({"error": "Recipe import is not allowed"}), 403
+    
+    upload = request.files.get('file')
+    fmt = request.args.get('format')
+    if upload is not None:
+        fmt = fmt or detect_format(upload.filename)
+        stream = upload.stream
+    else:
+        if fmt is None and request.mimetype == 'text/csv':
+            fmt = 'csv'
+        elif fmt is None and request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            fmt = 'jsonl'
+        stream = request.stream
+    
+    if fmt not in ('csv', 'jsonl'):
+        return jsonify({"error": "Import format must be csv or jsonl"}), 400
+    
+    batch_size = request.args.get('batch_size', default=DEFAULT_IMPORT_BATCH_SIZE, type=int)
+    defer_indexes = request.args.get('defer_indexes', default='false').lower() == 'true'
+    
+    try:
+        stats = import_stream(stream, fmt, max(batch_size, 1), defer_indexes)
+        return jsonify({"message": "Recipes imported", **stats})
+    except Exception as e:
+        logger.error(f"Error importing recipes: {e}", exc_info=True)
+        return jsonify({"error": f"Import failed: {str(e)}"}), 500
+
+@api.route('/api/recipes/<int:recipe_id>', methods=['GET'])
 def get_recipe(recipe_id):
     try:
+        catalog = catalog_version()
         recipe = get_recipe_by_id(recipe_id)
         if recipe:
-            return jsonify({"recipe": recipe})
+            return catalog_response({"recipe": recipe}, catalog)
         else:
             return jsonify({"error": "Recipe not found"}), 404
     except Exception as e:
         logger.error(f"Error getting recipe: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 
-@app.route('/api/recipes/search', methods=['GET'])
+@api.route('/api/recipes/batch', methods=['GET'])
+def get_recipes_batch():
+    try:
+        recipe_ids = parse_id_list(request.args.get('ids'))
+        fields = parse_fields(request.args.get('fields'), RECIPE_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    if not recipe_ids:
+        return jsonify({"error": "ids is required"}), 400
+    
+    try:
+        catalog = catalog_version()
+        recipes, missing = get_recipes_by_ids(recipe_ids, fields)
+        return catalog_response({"recipes": recipes, "missing": missing}, catalog)
+    except Exception as e:
+        logger.error(f"Error getting recipes: {e}", exc_info=True)
+        return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
+
+@api.route('/api/recipes/search', methods=['GET'])
 def search_recipe():
     query = request.args.get('query', '')
+    limit = request.args.get('limit', default=20, type=int)
+    offset = request.args.get('offset', default=0, type=int)
     
     if not query:
         return jsonify({"error": "Search query is required"}), 400
     
+    if limit < 1 or offset < 0:
+        return jsonify({"error": "limit must be positive and offset non-negative"}), 400
+    
     try:
-        recipes = search_recipes(query)
-        return jsonify({"recipes": recipes})
+        catalog = catalog_version()
+        recipes = search_recipes(query, min(limit, MAX_PAGE_SIZE), offset)
+        return catalog_response({"recipes": recipes}, catalog)
     except Exception as e:
         logger.error(f"Error searching recipes: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 
-@app.route('/api/recipes/favorite', methods=['POST'])
+@api.route('/api/recipes/favorite', methods=['POST'])
 def favorite_recipe():
     data = request.json
     username = data.get('username')
-    recipe_id = data.get('recipe_id')
+    recipe_id = parse_recipe_id(data.get('recipe_id'))
     
     if not username or not recipe_id:
-        return jsonify({"error": "Username and recipe_id are required"}), 400
+        return jsonify({"error": "Username and a numeric recipe_id are required"}), 400
     
     try:
         success = add_favorite_recipe(username, recipe_id)
@@ -584,14 +834,14 @@ def favorite_recipe():
         logger.error(f"Error adding favorite recipe: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 
-@app.route('/api/recipes/favorite', methods=['DELETE'])
+@api.route('/api/recipes/favorite', methods=['DELETE'])
 def unfavorite_recipe():
     data = request.json
     username = data.get('username')
-    recipe_id = data.get('recipe_id')
+    recipe_id = parse_recipe_id(data.get('recipe_id'))
     
     if not username or not recipe_id:
-        return jsonify({"error": "Username and recipe_id are required"}), 400
+        return jsonify({"error": "Username and a numeric recipe_id are required"}), 400
     
     try:
         success = remove_favorite_recipe(username, recipe_id)
@@ -603,7 +853,40 @@ def unfavorite_recipe():
         logger.error(f"Error removing favorite recipe: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 
-@app.route('/api/recipes/favorites', methods=['GET'])
+@api.route('/api/recipes/<int:recipe_id>/favorite', methods=['GET'])
+def get_favorite_status(recipe_id):
+    username = request.args.get('username')
+    
+    if not username:
+        return jsonify({"error": "Username is required"}), 400
+    
+    try:
+        favorite = recipe_id in get_favorite_ids(username)
+        return jsonify({"recipe_id": recipe_id, "favorite": favorite})
+    except Exception as e:
+        logger.error(f"Error checking favorite status: {e}", exc_info=True)
+        return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
+
+@api.route('/api/recipes/favorites/status', methods=['GET'])
+def get_favorite_statuses_route():
+    username = request.args.get('username')
+    
+    if not username:
+        return jsonify({"error": "Username is required"}), 400
+    
+    try:
+        recipe_ids = parse_id_list(request.args.get('ids'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        statuses = get_favorite_statuses(username, recipe_ids)
+        return jsonify({"favorites": {str(recipe_id): favorite for recipe_id, favorite in statuses.items()}})
+    except Exception as e:
+        logger.error(f"Error checking favorite statuses: {e}", exc_info=True)
+        return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
+
+@api.route('/api/recipes/favorites', methods=['GET'])
 def get_favorites_route():
     username = request.args.get('username')
     
@@ -611,12 +894,24 @@ def get_favorites_route():
         return jsonify({"error": "Username is required"}), 400
     
     try:
-        recipes = get_favorite_recipes(username)
-        return jsonify({"recipes": recipes})
+        after_id, limit = parse_page_args(request.args)
+        fields = parse_fields(request.args.get('fields'), FAVORITE_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        recipes, next_after_id = get_favorite_recipes(username, after_id, limit, fields)
+        return jsonify({
+            "recipes": recipes,
+            "total": len(get_favorite_ids(username)),
+            "next_after_id": next_after_id
+        })
     except Exception as e:
         logger.error(f"Error getting favorite recipes: {e}", exc_info=True)
         return jsonify({"error": f"Database error occurred: {str(e)}"}), 500
 
 if __name__ == '__main__':
+    # Development server; see wsgi.py for production
+    app = create_app()
     logger.info("Starting Flask server on port 5000")
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
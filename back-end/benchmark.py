@@ -0,0 +1,303 @@
+# benchmark.py
+#
+# Reproducible backend benchmarks. Generates a synthetic catalog and users,
+# loads them into a temporary database and times the main endpoints through
+# the Flask test client.
+#
+#   python benchmark.py [--recipes 10000] [--users 200] [--iterations 300] \
+#       [--seed 42] [--output results.json] [--compare baseline.json]
+#
+# Ingredient popularity follows a Zipf distribution (a few staples such as
+# salt or eggs appear in most recipes, most ingredients are rare), which is
+# what makes suggestion and matching queries expensive on real catalogs.
+# The same seed always produces the same catalog, pantries and request mix.
+#
+# With --compare, the run fails (exit status 1) if any operation's p95 is
+# more than --max-regression slower than in the baseline file.
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+INGREDIENT_WORDS = (
+    'salt', 'pepper', 'garlic', 'onion', 'butter', 'olive oil', 'eggs', 'flour', 'sugar', 'milk',
+    'tomato', 'lemon', 'rice', 'chicken', 'parsley', 'basil', 'carrot', 'potato', 'cheese', 'cream',
+    'ginger', 'cumin', 'paprika', 'thyme', 'beef', 'pork', 'salmon', 'shrimp', 'tofu', 'spinach',
+    'mushroom', 'bell pepper', 'zucchini', 'chickpeas', 'lentils', 'coconut milk', 'honey', 'vinegar',
+    'soy sauce', 'oregano', 'cinnamon', 'yogurt', 'bread', 'pasta', 'avocado', 'lime', 'cilantro',
+    'celery', 'cabbage', 'corn', 'beans', 'bacon', 'apple', 'banana', 'walnuts', 'almonds', 'oats',
+)
+ADJECTIVES = ('Spicy', 'Creamy', 'Roasted', 'Quick', 'Rustic', 'Smoky', 'Zesty', 'Golden', 'Herbed', 'Crispy')
+DISHES = ('Stew', 'Salad', 'Curry', 'Soup', 'Bake', 'Stir-Fry', 'Pie', 'Bowl', 'Tacos', 'Risotto')
+
+PERCENTILES = (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))
+
+def zipf_sampler(rng, items, exponent):
+    """Return a function drawing ``count`` distinct items with Zipf-skewed popularity."""
+    cum_weights = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, len(items) + 1)))
+
+    def sample(count):
+        # A dict keeps draw order, so results do not depend on string hashing
+        chosen = {}
+        while len(chosen) < count:
+            chosen.update(dict.fromkeys(rng.choices(items, cum_weights=cum_weights, k=count - len(chosen))))
+        return list(chosen)
+    return sample
+
+def ingredient_vocabulary(size):
+    """``size`` distinct ingredient names, most common first."""
+    names = list(INGREDIENT_WORDS)
+    for word, n in zip(itertools.cycle(INGREDIENT_WORDS), itertools.count(1)):
+        if len(names) >= size:
+            break
+        names.append(f"{word} variety {n}")
+    return names[:size]
+
+def generate_recipes(rng, sample_ingredients, count, min_ingredients=4, max_ingredients=14):
+    """Yield recipe records in the shape recipe_import.parse_record() produces."""
+    for n in range(count):
+        ingredients = sample_ingredients(rng.randint(min_ingredients, max_ingredients))
+        name = f"{rng.choice(ADJECTIVES)} {ingredients[0].title()} {rng.choice(DISHES)}"
+        yield {
+            'external_id': f"bench-{n}",
+            'name': name,
+            'description': f"A {name.lower()} with {', '.join(ingredients[1:3])}",
+            'preparation_time': rng.randint(5, 60),
+            'cooking_time': rng.randint(0, 120),
+            'servings': rng.randint(1, 8),
+            'difficulty': rng.choice(('easy', 'medium', 'hard')),
+            'image_url': None,
+            'instructions': '\n'.join(f"{step}. Add the {i}" for step, i in enumerate(ingredients, start=1)),
+            'ingredients': [(i, None, None) for i in ingredients],
+        }
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    result = {}
+    for name, fraction in PERCENTILES:
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        result[name] = round(ordered[index] * 1000, 3)
+    return result
+
+def time_operation(client, name, make_request, iterations, warmup):
+    """
+    Time ``make_request(client, i)`` calls.
+
+    Returns:
+        Dict with latency percentiles and mean in ms, throughput and errors
+    """
+    for i in range(warmup):
+        make_request(client, i)
+
+    samples = []
+    errors = 0
+    for i in range(iterations):
+        started = time.perf_counter()
+        response = make_request(client, i)
+        samples.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors += 1
+
+    total = sum(samples)
+    stats = {
+        **percentiles(samples),
+        "mean": round(total / len(samples) * 1000, 3),
+        "ops_per_second": round(len(samples) / total, 1),
+        "iterations": iterations,
+        "errors": errors,
+    }
+    logger.info(f"{name}: p50 {stats['p50']} ms, p95 {stats['p95']} ms, p99 {stats['p99']} ms")
+    return stats
+
+def build_operations(rng, usernames, pantries, vocabulary, recipe_count):
+    """Request makers keyed by operation name; each takes (client, iteration)."""
+    search_terms = [name.split()[0] for name in vocabulary[:200]]
+    recipe_ids = [rng.randint(1, recipe_count) for _ in range(1000)]
+    chat_pantries = [rng.sample(pantry, min(len(pantry), 8)) for pantry in pantries]
+    bulk_items = [rng.sample(vocabulary, 20) for _ in range(50)]
+    # Every keystroke of the first 200 names
+    prefixes = [name[:length] for name in vocabulary[:200] for length in range(1, min(len(name), 6) + 1)]
+
+    def user(i):
+        return usernames[i % len(usernames)]
+
+    return {
+        'suggest': lambda c, i: c.get(f"/api/recipes/suggest?username={user(i)}"),
+        'chat_recipes': lambda c, i: c.post(
+            "/api/chat/recipes", json={"ingredients": chat_pantries[i % len(chat_pantries)]}
+        ),
+        'search': lambda c, i: c.get(
+            "/api/recipes/search", query_string={"query": search_terms[i % len(search_terms)]}
+        ),
+        'recipe_by_id': lambda c, i: c.get(f"/api/recipes/{recipe_ids[i % len(recipe_ids)]}"),
+        'autocomplete': lambda c, i: c.get(
+            "/api/ingredients/autocomplete", query_string={"prefix": prefixes[i % len(prefixes)]}
+        ),
+        'list_ingredients': lambda c, i: c.get(f"/api/ingredients?username={user(i)}&limit=50"),
+        'add_ingredients': lambda c, i: c.post("/api/add_ingredients", json={
+            "username": user(i), "ingredients": bulk_items[i % len(bulk_items)], "only_changed": True
+        }),
+        'update_ingredient_status': lambda c, i: c.post("/api/update_ingredient_status", json={
+            "username": user(i),
+            "ingredients": [{"name": name, "checked": i % 2 == 0} for name in pantries[i % len(pantries)][:10]]
+        }),
+    }
+
+def environment_info():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+def compare(results, baseline, max_regression):
+    """
+    Compare p95 latencies against a baseline run.
+
+    Returns:
+        List of (operation, baseline p95, current p95) for regressions
+    """
+    regressions = []
+    for name, stats in results['operations'].items():
+        before = baseline.get('operations', {}).get(name)
+        if before is None:
+            continue
+        ratio = stats['p95'] / before['p95'] if before['p95'] else 1.0
+        logger.info(f"{name}: p95 {before['p95']} -> {stats['p95']} ms ({ratio:.2f}x)")
+        if ratio > 1 + max_regression:
+            regressions.append((name, before['p95'], stats['p95']))
+    return regressions
+
+def run(args, db_path):
+    # db.DB_PATH is resolved at import time, so the app modules are only
+    # imported once FOOD_PLANNER_DB points at the scratch database
+    os.environ['FOOD_PLANNER_DB'] = db_path
+    from backend import create_app
+    from db import SQL_BATCH_SIZE, close_all, get_connection
+    from migration import migrate_database
+    from recipe_import import import_recipes
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    rng = random.Random(args.seed)
+    vocabulary = ingredient_vocabulary(args.ingredients)
+    sample_ingredients = zipf_sampler(rng, vocabulary, args.zipf_exponent)
+
+    migrate_database()
+    started = time.perf_counter()
+    import_recipes(generate_recipes(rng, sample_ingredients, args.recipes), batch_size=5000,
+                   defer_indexes=True, rebuild_index=False)
+    load_seconds = time.perf_counter() - started
+    logger.info(f"Loaded {args.recipes} recipes in {load_seconds:.1f}s")
+
+    usernames = [f"bench_user_{n}" for n in range(args.users)]
+    pantries = [sample_ingredients(rng.randint(10, 40)) for _ in usernames]
+    conn = get_connection()
+    conn.executemany(
+        "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+        [(name, f"{name}@example.com", 'benchmark') for name in usernames]
+    )
+    conn.commit()
+    conn.close()
+
+    started = time.perf_counter()
+    client = create_app().test_client()
+    startup_seconds = time.perf_counter() - started
+
+    # Fill the pantries through the bulk endpoint
+    for name, pantry in zip(usernames, pantries):
+        for start in range(0, len(pantry), SQL_BATCH_SIZE):
+            client.post("/api/add_ingredients", json={
+                "username": name, "ingredients": pantry[start:start + SQL_BATCH_SIZE], "only_changed": True
+            })
+
+    operations = build_operations(rng, usernames, pantries, vocabulary, args.recipes)
+    selected = args.operations or list(operations)
+    results = {
+        "parameters": {
+            "recipes": args.recipes, "users": args.users, "ingredients": args.ingredients,
+            "zipf_exponent": args.zipf_exponent, "iterations": args.iterations,
+            "warmup": args.warmup, "seed": args.seed,
+        },
+        "environment": environment_info(),
+        "started_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "load_seconds": round(load_seconds, 3),
+        "startup_seconds": round(startup_seconds, 3),
+        "operations": {
+            name: time_operation(client, name, operations[name], args.iterations, args.warmup)
+            for name in selected
+        },
+    }
+    close_all()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backend on a synthetic catalog")
+    parser.add_argument('--recipes', type=int, default=10000, help="Recipes in the catalog")
+    parser.add_argument('--users', type=int, default=200, help="Users with pantries")
+    parser.add_argument('--ingredients', type=int, default=2000, help="Distinct ingredient names")
+    parser.add_argument('--zipf-exponent', type=float, default=1.1,
+                        help="Skew of ingredient popularity (higher means more staples)")
+    parser.add_argument('--iterations', type=int, default=300, help="Timed requests per operation")
+    parser.add_argument('--warmup', type=int, default=20, help="Untimed requests per operation")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--operation', action='append', dest='operations',
+                        help="Only run this operation (repeatable)")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--compare', help="Baseline results file to compare p95 latencies against")
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help="Allowed p95 slowdown against the baseline, as a fraction")
+    parser.add_argument('--keep-db', action='store_true', help="Keep the generated database")
+    parser.add_argument('--verbose', action='store_true', help="Show application logs")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='food_planner_bench_')
+    db_path = os.path.join(workdir, 'food_planner.db')
+    try:
+        results = run(args, db_path)
+    finally:
+        if args.keep_db:
+            logger.info(f"Database kept at {db_path}")
+        else:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+            os.rmdir(workdir)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        for name, before, after in regressions:
+            logger.error(f"Regression in {name}: p95 {before} ms -> {after} ms")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,66 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Every cache created in this process, by name, for stats reporting
+_caches = {}
+
+MISSING = object()
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional per-entry time to live.
+
+    Cached values are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(self, name, maxsize, ttl=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        _caches[name] = self
+
+    def get(self, key, default=MISSING):
+        """Return the cached value for ``key``, or ``default`` if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None
+        }
+
+def cache_stats():
+    """Hit/miss statistics of every cache, keyed by cache name."""
+    return {name: cache.stats() for name, cache in _caches.items()}
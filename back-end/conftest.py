@@ -0,0 +1,43 @@
+# conftest.py
+#
+# Shared pytest setup for the backend tests:
+#
+#   cd back-end && python -m pytest -q
+#
+# db.DB_PATH is resolved at import time, so FOOD_PLANNER_DB is pointed at a
+# scratch database here, before any test module imports the app modules.
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_scratch_dir = tempfile.mkdtemp(prefix='food_planner_test_')
+os.environ['FOOD_PLANNER_DB'] = os.path.join(_scratch_dir, 'food_planner.db')
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    """Migrated scratch database shared by the whole test session."""
+    from db import close_all
+    from migration import migrate_database
+
+    migrate_database()
+    yield os.environ['FOOD_PLANNER_DB']
+    close_all()
+    shutil.rmtree(_scratch_dir, ignore_errors=True)
+
+@pytest.fixture
+def add_user(database):
+    """Create a user row (pantry rows reference users) and return its name."""
+    from db import get_connection
+
+    def add(username):
+        conn = get_connection()
+        conn.execute(
+            "INSERT OR IGNORE INTO users (username, email, password) VALUES (?, ?, ?)",
+            (username, f"{username}@example.com", 'not-a-real-hash')
+        )
+        conn.commit()
+        conn.close()
+        return username
+    return add
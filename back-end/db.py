@@ -0,0 +1,204 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Database location, resolved once for every module. Override with the
+# FOOD_PLANNER_DB environment variable.
+DB_PATH = os.path.abspath(os.environ.get('FOOD_PLANNER_DB', 'food_planner.db'))
+
+# Maximum number of idle connections kept for reuse
+POOL_SIZE = int(os.environ.get('FOOD_PLANNER_DB_POOL_SIZE', '8'))
+
+# Prepared statements cached per connection
+STATEMENT_CACHE_SIZE = 256
+
+# Maximum number of bound parameters used in a single IN (...) clause
+SQL_BATCH_SIZE = 500
+
+# Seconds to wait for a lock held by another writer before failing
+BUSY_TIMEOUT = 5.0
+
+PRAGMAS = (
+    # Readers no longer block behind writers (and vice versa)
+    "PRAGMA journal_mode = WAL",
+    # WAL is still crash-safe with NORMAL; only the last commits may roll back on power loss
+    "PRAGMA synchronous = NORMAL",
+    # Negative value is in KiB: 20 MB page cache per connection
+    "PRAGMA cache_size = -20000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+)
+
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+_local = threading.local()
+
+# Called as observer(cursor, sql, params, seconds) after every statement run
+# through a pooled connection; see set_statement_observer()
+_observer = None
+
+# Connections opened since start-up (pool misses)
+_opened = 0
+_opened_lock = threading.Lock()
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor that reports each statement and its duration to the observer."""
+
+    def execute(self, sql, parameters=()):
+        if _observer is None:
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _observer(self, sql, parameters, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        if _observer is None:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _observer(self, sql, None, time.perf_counter() - started)
+
+class PooledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that goes back to the pool when closed.
+
+    Existing code keeps the ``conn = get_connection() ... conn.close()``
+    pattern; ``close()`` only releases the connection. Nested users on the
+    same thread share one connection, and it is released when the outermost
+    caller closes it.
+    """
+
+    def close(self):
+        if getattr(_local, 'conn', None) is not self:
+            # Already released
+            return
+        _local.depth -= 1
+        if _local.depth == 0:
+            _release(self)
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # The built-in shortcuts bypass cursor(), so route them through it
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close_for_good(self):
+        super().close()
+
+def _connect():
+    global _opened
+    with _opened_lock:
+        _opened += 1
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=PooledConnection,
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def set_statement_observer(observer):
+    """
+    Install (or with None, remove) the function called after every SQL
+    statement executed through a pooled connection.
+
+    Args:
+        observer: Callable taking (cursor, sql, params, seconds); params is
+            None for executemany()
+    """
+    global _observer
+    _observer = observer
+
+def connections_opened():
+    """Number of new database connections opened by this process."""
+    return _opened
+
+def get_connection():
+    """
+    Get a database connection for the current thread.
+
+    Connections are reused from a pool instead of being opened per request.
+    Callers must ``close()`` the connection when done, which returns it to
+    the pool.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _local.depth += 1
+        return conn
+
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+
+    _local.conn = conn
+    _local.depth = 1
+    return conn
+
+def _release(conn):
+    _local.conn = None
+    _local.depth = 0
+
+    if conn.in_transaction:
+        # Never hand out a connection with someone else's pending writes
+        conn.rollback()
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close_for_good()
+
+def release_thread_connection():
+    """
+    Return the current thread's connection to the pool even if callers did
+    not close it (e.g. a request that failed half way). Uncommitted changes
+    are rolled back.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _release(conn)
+
+def _reset_after_fork():
+    # Connections opened before fork() belong to the parent. Closing them in
+    # the child could checkpoint or delete the parent's WAL files, so they
+    # are kept referenced (never closed or garbage collected) and the child
+    # starts with an empty pool.
+    global _pool, _local, _opened
+    while True:
+        try:
+            _inherited.append(_pool.get_nowait())
+        except queue.Empty:
+            break
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _inherited.append(conn)
+    _pool = queue.LifoQueue(maxsize=POOL_SIZE)
+    _local = threading.local()
+    _opened = 0
+
+_inherited = []
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+def close_all():
+    """Close every idle pooled connection (e.g. on shutdown)."""
+    while True:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            break
+        conn.close_for_good()
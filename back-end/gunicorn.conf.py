@@ -0,0 +1,24 @@
+# gunicorn.conf.py
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# FOOD_PLANNER_BIND     address to listen on (default 0.0.0.0:5000)
+# FOOD_PLANNER_WORKERS  worker processes (default: number of CPUs)
+# FOOD_PLANNER_THREADS  threads per worker (default 4)
+import os
+
+bind = os.environ.get('FOOD_PLANNER_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('FOOD_PLANNER_WORKERS', os.cpu_count() or 1))
+threads = int(os.environ.get('FOOD_PLANNER_THREADS', '4'))
+worker_class = 'gthread'
+
+# Build the app (and warm the catalog) once in the master; workers share it
+# copy-on-write instead of each repeating the startup work
+preload_app = True
+
+accesslog = '-'
+
+def worker_exit(server, worker):
+    # Write pantry toggles still held by the write-behind buffer
+    import write_behind
+    write_behind.shutdown()
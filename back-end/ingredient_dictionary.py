@@ -0,0 +1,175 @@
+import re
+import threading
+import logging
+
+from db import SQL_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Synonyms seeded into ingredient_aliases (alias -> canonical name)
+SEED_ALIASES = {
+    'scallion': 'green onion',
+    'spring onion': 'green onion',
+    'courgette': 'zucchini',
+    'aubergine': 'eggplant',
+    'garbanzo bean': 'chickpea',
+}
+
+# Words the suffix rules below get wrong: irregular plurals, -ie nouns
+# (which the -ies rule would turn into -y), -che nouns and words that end in
+# -s in the singular
+IRREGULAR_PLURALS = {
+    'leaves': 'leaf',
+    'loaves': 'loaf',
+    'halves': 'half',
+    'knives': 'knife',
+    'cookies': 'cookie',
+    'brownies': 'brownie',
+    'pies': 'pie',
+    'smoothies': 'smoothie',
+    'veggies': 'veggie',
+    'quiches': 'quiche',
+    'brioches': 'brioche',
+    'ganaches': 'ganache',
+    'mousses': 'mousse',
+    'molasses': 'molasses',
+}
+
+_WHITESPACE = re.compile(r'\s+')
+
+# normalized name -> ingredient_dictionary.id, only for committed rows
+_cache = {}
+_lock = threading.Lock()
+
+def normalize_name(name):
+    """Lowercase an ingredient name and collapse whitespace."""
+    return _WHITESPACE.sub(' ', name.strip().lower())
+
+def strip_plural_suffix(word):
+    """Singular of one word by the suffix rules alone, without IRREGULAR_PLURALS."""
+    if len(word) <= 3 or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'sses', 'xes', 'zes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+def singularize(name):
+    """Singular form of a normalized ingredient name ("eggs" -> "egg")."""
+    head, sep, last = name.rpartition(' ')
+    if last in IRREGULAR_PLURALS:
+        last = IRREGULAR_PLURALS[last]
+    else:
+        last = strip_plural_suffix(last)
+    return head + sep + last
+
+def canonical_name(name):
+    """Dictionary name for an ingredient, ignoring aliases stored in the database."""
+    return singularize(normalize_name(name))
+
+def _fetch_pairs(cursor, query, keys):
+    pairs = {}
+    keys = list(keys)
+    for start in range(0, len(keys), SQL_BATCH_SIZE):
+        batch = keys[start:start + SQL_BATCH_SIZE]
+        placeholders = ','.join(['?'] * len(batch))
+        cursor.execute(query.format(placeholders=placeholders), batch)
+        pairs.update((row[0], row[1]) for row in cursor.fetchall())
+    return pairs
+
+def resolve_ingredient_ids(cursor, names, create=True):
+    """
+    Map ingredient names to ingredient_dictionary ids.
+
+    Names are normalized, then looked up as an alias or by their singular
+    canonical form, so "Eggs", "egg" and "eggs " all resolve to the same id.
+
+    Args:
+        cursor: Cursor on the connection to read (and write) through
+        names: Iterable of ingredient names as entered by users or recipes
+        create: Add unknown ingredients to the dictionary (and plural/synonym
+            spellings to ingredient_aliases). The caller commits.
+
+    Returns:
+        Dict of name -> ingredient id. With create=False, unknown names are
+        left out.
+    """
+    # Rows read inside an open transaction may still be rolled back, so only
+    # lookups made outside one are remembered
+    cacheable = not cursor.connection.in_transaction
+
+    ids = {}
+    pending = {}
+    for name in names:
+        key = normalize_name(name)
+        ingredient_id = _cache.get(key)
+        if ingredient_id is not None:
+            ids[name] = ingredient_id
+        else:
+            pending.setdefault(key, []).append(name)
+
+    if not pending:
+        return ids
+
+    canonical = {key: singularize(key) for key in pending}
+    aliases = _fetch_pairs(
+        cursor,
+        "SELECT alias, ingredient_id FROM ingredient_aliases WHERE alias IN ({placeholders})",
+        set(pending) | set(canonical.values()),
+    )
+    by_name = _fetch_pairs(
+        cursor,
+        "SELECT name, id FROM ingredient_dictionary WHERE name IN ({placeholders})",
+        set(canonical.values()),
+    )
+
+    found = {}
+    for key, name in canonical.items():
+        ingredient_id = aliases.get(key) or aliases.get(name) or by_name.get(name)
+        if ingredient_id is not None:
+            found[key] = ingredient_id
+
+    if cacheable:
+        with _lock:
+            _cache.update(found)
+
+    missing = {key: name for key, name in canonical.items() if key not in found}
+    if missing and create:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO ingredient_dictionary (name) VALUES (?)",
+            [(name,) for name in set(missing.values())],
+        )
+        created = _fetch_pairs(
+            cursor,
+            "SELECT name, id FROM ingredient_dictionary WHERE name IN ({placeholders})",
+            set(missing.values()),
+        )
+        for key, name in missing.items():
+            found[key] = created[name]
+        # Remember plural spellings so later lookups hit the alias table
+        cursor.executemany(
+            "INSERT OR IGNORE INTO ingredient_aliases (alias, ingredient_id) VALUES (?, ?)",
+            [(key, found[key]) for key, name in missing.items() if key != name],
+        )
+
+    for key, key_names in pending.items():
+        if key in found:
+            for name in key_names:
+                ids[name] = found[key]
+
+    return ids
+
+def seed_aliases(cursor):
+    """Add SEED_ALIASES to the dictionary (idempotent)."""
+    canonical_ids = resolve_ingredient_ids(cursor, set(SEED_ALIASES.values()))
+    cursor.executemany(
+        "INSERT OR IGNORE INTO ingredient_aliases (alias, ingredient_id) VALUES (?, ?)",
+        [(alias, canonical_ids[name]) for alias, name in SEED_ALIASES.items()],
+    )
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,255 @@
+# ingredient_vocabulary.py
+#
+# In-memory vocabulary of the ingredient names used by catalog recipes, for
+# autocomplete and for correcting misspelled ingredients in chat requests.
+#
+# Lookup keys are kept in one sorted list, so the keys starting with a prefix
+# form a contiguous range found with two bisections. Every dictionary name is
+# a key, as are the later words of multi-word names ("onion" finds "red
+# onion") and the aliases stored in ingredient_aliases ("scallion" finds
+# "green onion"). Each key points at the dictionary name it stands for, and
+# names are ranked by the number of recipes using them.
+#
+# Prefixes matching more than LARGE_PREFIX_KEYS keys (short ones like "c" or
+# a word many names share) are ranked once per refresh, so a keystroke never
+# ranks more than LARGE_PREFIX_KEYS keys.
+#
+# Misspellings are corrected through an inverted index from character
+# trigrams to the names and aliases containing them: only spellings sharing
+# a trigram with the term are scored, by trigram similarity (shared trigrams
+# over the union, as in PostgreSQL's pg_trgm).
+#
+# refresh() rebuilds all of this whenever the catalog version changes (see
+# recipes_db.refresh_catalog), right after the recipe index it reads the
+# recipe counts from, and swaps the new state in at once.
+import bisect
+import heapq
+import logging
+import threading
+
+import recipe_index
+from ingredient_dictionary import canonical_name, normalize_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+# Prefixes matching more keys than this are answered from precomputed rankings
+LARGE_PREFIX_KEYS = 200
+
+# Minimum trigram similarity for a correction
+FUZZY_MATCH_THRESHOLD = 0.4
+
+# Sorts after every character that can follow a prefix in a key
+_PREFIX_END = '\U0010ffff'
+
+NAMES_SQL = "SELECT id, name FROM ingredient_dictionary"
+
+ALIASES_SQL = """
+    SELECT a.alias, d.name
+    FROM ingredient_aliases a
+    JOIN ingredient_dictionary d ON d.id = a.ingredient_id
+"""
+
+# Serializes refreshes
+_lock = threading.Lock()
+# Replaced as a whole on refresh, so readers never need the lock
+_state = {
+    # Sorted list of (key, name) pairs
+    'entries': [],
+    # name -> number of recipes using it
+    'counts': {},
+    # Prefix matching more than LARGE_PREFIX_KEYS keys -> its MAX_LIMIT best names
+    'large_prefixes': {},
+    # Names and aliases as (spelling, name, number of trigrams)
+    'spellings': [],
+    # Trigram -> indexes into spellings
+    'trigrams': {},
+    # Every key, for telling known terms from misspellings
+    'known': frozenset(),
+}
+
+def _keys_for(name, aliases):
+    words = name.split(' ')
+    keys = {(name, name)}
+    keys.update((' '.join(words[i:]), name) for i in range(1, len(words)))
+    keys.update((alias, name) for alias in aliases.get(name, ()))
+    return keys
+
+def _trigrams(text):
+    # Each word is padded like pg_trgm does, so starts and ends of words count
+    grams = set()
+    for word in text.split(' '):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def _index_spellings(counts, aliases):
+    spellings = []
+    trigrams = {}
+    for name in counts:
+        for spelling in (name, *aliases.get(name, ())):
+            grams = _trigrams(spelling)
+            for gram in grams:
+                trigrams.setdefault(gram, []).append(len(spellings))
+            spellings.append((spelling, name, len(grams)))
+    return spellings, trigrams
+
+def refresh(conn):
+    """
+    Rebuild the vocabulary from the recipe index and the ingredient dictionary.
+
+    Returns:
+        Number of lookup keys
+    """
+    global _state
+    with _lock:
+        recipe_index.ensure_built(conn)
+        recipe_counts = recipe_index.recipe_counts()
+
+        cursor = conn.cursor()
+        cursor.execute(NAMES_SQL)
+        counts = {row[1]: recipe_counts[row[0]] for row in cursor.fetchall() if row[0] in recipe_counts}
+        cursor.execute(ALIASES_SQL)
+        aliases = {}
+        for alias, name in cursor.fetchall():
+            if alias != name and name in counts:
+                aliases.setdefault(name, set()).add(alias)
+
+        keys = set()
+        for name in counts:
+            keys.update(_keys_for(name, aliases))
+        entries = sorted(keys)
+
+        spellings, trigrams = _index_spellings(counts, aliases)
+        _state = {
+            'entries': entries,
+            'counts': counts,
+            'large_prefixes': _rank_large_prefixes(entries, counts),
+            'spellings': spellings,
+            'trigrams': trigrams,
+            'known': frozenset(key for key, _ in entries),
+        }
+
+    logger.info(f"Ingredient vocabulary rebuilt: {len(counts)} names, {len(entries)} keys")
+    return len(entries)
+
+def _rank(counts):
+    return lambda name: (-counts[name], name)
+
+def _rank_large_prefixes(entries, counts):
+    rank = _rank(counts)
+    ranked = {}
+    # Split each large range by the next character, starting from the whole list
+    ranges = [('', 0, len(entries))]
+    while ranges:
+        prefix, start, end = ranges.pop()
+        depth = len(prefix) + 1
+        # Keys equal to the prefix sort first and have no next character
+        while start < end and len(entries[start][0]) < depth:
+            start += 1
+        while start < end:
+            child = entries[start][0][:depth]
+            child_end = bisect.bisect_left(entries, (child + _PREFIX_END,), start, end)
+            if child_end - start > LARGE_PREFIX_KEYS:
+                names = {name for _, name in entries[start:child_end]}
+                ranked[child] = heapq.nsmallest(MAX_LIMIT, names, key=rank)
+                ranges.append((child, start, child_end))
+            start = child_end
+    return ranked
+
+def complete(prefix, limit=DEFAULT_LIMIT):
+    """
+    Ingredient names for an autocomplete prefix, most used first.
+
+    Args:
+        prefix: Text typed so far; case and extra whitespace are ignored
+        limit: Maximum number of names to return (at most MAX_LIMIT)
+
+    Returns:
+        List of {'name', 'recipes'} dicts, ties broken alphabetically
+    """
+    key = normalize_name(prefix)
+    if not key:
+        return []
+
+    state = _state
+    entries, counts = state['entries'], state['counts']
+    ranked = state['large_prefixes'].get(key)
+    if ranked is not None:
+        best = ranked[:limit]
+    else:
+        start = bisect.bisect_left(entries, (key,))
+        end = bisect.bisect_left(entries, (key + _PREFIX_END,), start)
+        names = {name for _, name in entries[start:end]}
+        best = heapq.nsmallest(limit, names, key=_rank(counts))
+    return [{'name': name, 'recipes': counts[name]} for name in best]
+
+def closest_name(term):
+    """
+    Vocabulary name most similar to a (misspelled) ingredient.
+
+    The term is also compared in its singular form, since names are stored
+    singular ("chikpeas" is closer to "chickpea" as "chikpea").
+
+    Args:
+        term: Normalized ingredient name
+
+    Returns:
+        Tuple of (name, similarity), or None if no name reaches
+        FUZZY_MATCH_THRESHOLD
+    """
+    state = _state
+    spellings, counts = state['spellings'], state['counts']
+
+    best = None
+    best_rank = None
+    for variant in {term, canonical_name(term)}:
+        grams = _trigrams(variant)
+        shared = {}
+        for gram in grams:
+            for index in state['trigrams'].get(gram, ()):
+                shared[index] = shared.get(index, 0) + 1
+
+        for index, common in shared.items():
+            _, name, size = spellings[index]
+            similarity = common / (len(grams) + size - common)
+            if similarity < FUZZY_MATCH_THRESHOLD:
+                continue
+            # Most similar, then most used, then alphabetical
+            rank = (-similarity, -counts[name], name)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = (name, similarity), rank
+    return best
+
+def correct_terms(terms):
+    """
+    Replace misspelled ingredients with the closest vocabulary name.
+
+    Terms that are a known name, alias or word of a name (also after
+    singularizing) are kept as they are, as are terms with no close match.
+
+    Args:
+        terms: Ingredient names as entered by the user
+
+    Returns:
+        Tuple of (terms with corrections applied, dict of original term ->
+        corrected name)
+    """
+    known = _state['known']
+    corrected = []
+    corrections = {}
+    for term in terms:
+        key = normalize_name(term)
+        if key and key not in known and canonical_name(key) not in known:
+            match = closest_name(key)
+            if match is not None:
+                corrections[term] = match[0]
+                term = match[0]
+        corrected.append(term)
+    return corrected, corrections
+
+def size():
+    """Number of names in the vocabulary."""
+    return len(_state['counts'])
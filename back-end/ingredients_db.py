@@ -1,38 +1,520 @@
-import sqlite3
+import logging
+import os
 
-def init_db():
-    conn = sqlite3.connect('food_planner.db')
+import suggestion_state
+import write_behind
+from db import SQL_BATCH_SIZE, get_connection
+from ingredient_dictionary import resolve_ingredient_ids
+
+logger = logging.getLogger(__name__)
+
+# Columns a client may ask for with ?fields=
+INGREDIENT_FIELDS = ('id', 'name', 'checked')
+
+# Pantry change log for delta sync. Every insert, checked flip and delete of
+# a pantry row bumps the owner's pantry_versions.version and logs the row's
+# new state (or a tombstone) under that version, so clients can ask for
+# everything that changed since the version they last saw.
+PANTRY_CHANGE_LOG_SQL = (
+    """
+    CREATE TABLE IF NOT EXISTS pantry_versions (
+        username TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        min_version INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS pantry_changes (
+        username TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        checked BOOLEAN,
+        deleted BOOLEAN NOT NULL DEFAULT 0,
+        changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (username, version)
+    ) WITHOUT ROWID
+    """,
+    # Compaction keeps the newest entry per item
+    """
+    CREATE INDEX IF NOT EXISTS idx_pantry_changes_username_item_id
+    ON pantry_changes (username, item_id)
+    """,
+)
+
+_BUMP_PANTRY_VERSION = """
+        INSERT INTO pantry_versions (username, version) VALUES ({row}.username, 1)
+        ON CONFLICT (username) DO UPDATE SET version = version + 1;
+"""
+
+PANTRY_CHANGE_TRIGGERS = {
+    'ingredients_changes_ai': f"""
+    CREATE TRIGGER IF NOT EXISTS ingredients_changes_ai AFTER INSERT ON ingredients BEGIN
+        {_BUMP_PANTRY_VERSION.format(row='new')}
+        INSERT INTO pantry_changes (username, version, item_id, name, checked)
+        SELECT new.username, version, new.id, new.name, new.checked
+        FROM pantry_versions WHERE username = new.username;
+    END
+    """,
+    'ingredients_changes_au': f"""
+    CREATE TRIGGER IF NOT EXISTS ingredients_changes_au AFTER UPDATE OF name, checked ON ingredients
+    WHEN old.name IS NOT new.name OR old.checked IS NOT new.checked BEGIN
+        {_BUMP_PANTRY_VERSION.format(row='new')}
+        INSERT INTO pantry_changes (username, version, item_id, name, checked)
+        SELECT new.username, version, new.id, new.name, new.checked
+        FROM pantry_versions WHERE username = new.username;
+    END
+    """,
+    'ingredients_changes_ad': f"""
+    CREATE TRIGGER IF NOT EXISTS ingredients_changes_ad AFTER DELETE ON ingredients BEGIN
+        {_BUMP_PANTRY_VERSION.format(row='old')}
+        INSERT INTO pantry_changes (username, version, item_id, name, deleted)
+        SELECT old.username, version, old.id, old.name, 1
+        FROM pantry_versions WHERE username = old.username;
+    END
+    """,
+}
+
+# A user's log is compacted each time their version crosses a multiple of this
+PANTRY_COMPACT_INTERVAL = int(os.environ.get('FOOD_PLANNER_PANTRY_COMPACT_INTERVAL', '200'))
+
+# Tombstones older than this are dropped; clients that last synced before
+# then get a full reset
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get('FOOD_PLANNER_TOMBSTONE_RETENTION_DAYS', '30'))
+
+def _format_ingredients(rows, fields=INGREDIENT_FIELDS, pending=None):
+    # rows are plain tuples in ``fields`` order; ``pending`` holds buffered
+    # write-behind statuses by name, which win over the stored ones
+    ingredients = [dict(zip(fields, row)) for row in rows]
+    if 'checked' in fields:
+        for ingredient in ingredients:
+            if pending and ingredient['name'] in pending:
+                ingredient['checked'] = pending[ingredient['name']]
+            else:
+                ingredient['checked'] = bool(ingredient['checked'])
+    return ingredients
+
+def parse_ingredient_items(ingredients):
+    """
+    Normalize an ``ingredients`` request payload into (name, checked) pairs.
+
+    Items may be plain names or {"name": ..., "checked": ...} objects.
+    """
+    items = []
+    for ingredient in ingredients:
+        if isinstance(ingredient, dict):
+            items.append((ingredient.get('name'), bool(ingredient.get('checked', False))))
+        else:
+            items.append((ingredient, False))
+    return items
+
+def get_ingredients(username, names=None):
+    """
+    Get a user's pantry, newest first.
+
+    Args:
+        username: Owner of the pantry
+        names: Only return these ingredient names (None for all)
+    """
+    # Taken before the query: a flush committing in between is then still
+    # overlaid instead of being missed by both the snapshot and the query
+    pending = write_behind.pending(username)
+
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS ingredients (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        username TEXT,
-                        ingredient TEXT,
-                        FOREIGN KEY (username) REFERENCES users(username))''')
-    conn.commit()
+    cursor.row_factory = None
+
+    if names is None:
+        cursor.execute(
+            "SELECT id, name, checked FROM ingredients WHERE username = ? ORDER BY id DESC",
+            (username,)
+        )
+        rows = cursor.fetchall()
+    else:
+        names = list(dict.fromkeys(names))
+        rows = []
+        for start in range(0, len(names), SQL_BATCH_SIZE):
+            batch = names[start:start + SQL_BATCH_SIZE]
+            placeholders = ','.join(['?'] * len(batch))
+            cursor.execute(
+                f"SELECT id, name, checked FROM ingredients WHERE username = ? AND name IN ({placeholders})",
+                [username] + batch
+            )
+            rows.extend(cursor.fetchall())
+        rows.sort(key=lambda row: row[0], reverse=True)
+
     conn.close()
+    return _format_ingredients(rows, pending=pending)
+
+def ingredients_page_query(username, after_id=None, limit=None, fields=INGREDIENT_FIELDS):
+    """
+    Build the keyset query for one page of a user's pantry, newest first.
+
+    Shared by get_ingredients_page() and the async API, which runs it on its
+    own connection.
+
+    Returns:
+        Tuple of (sql, parameters, selected columns)
+
+    Raises:
+        ValueError: If ``fields`` names an unknown field
+    """
+    unknown = set(fields) - set(INGREDIENT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown ingredient fields: {', '.join(sorted(unknown))}")
+
+    # id is always read for the cursor, and name for overlaying buffered
+    # statuses; both are dropped later if not requested
+    columns = ['id', 'name'] + [field for field in fields if field not in ('id', 'name')]
+    query = f"SELECT {', '.join(columns)} FROM ingredients WHERE username = ?"
+    params = [username]
+    if after_id is not None:
+        query += " AND id < ?"
+        params.append(after_id)
+    query += " ORDER BY id DESC"
+    if limit is not None:
+        # One extra row tells us whether there is a next page
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    return query, params, columns
+
+def ingredients_page_result(rows, columns, fields, limit, pending=None):
+    """
+    Shape rows (plain tuples) read with ingredients_page_query().
 
-def add_ingredients(username, ingredients):
-    conn = sqlite3.connect('food_planner.db')
+    Args:
+        pending: write_behind.pending() statuses of the pantry's owner,
+            taken before the rows were read
+
+    Returns:
+        Tuple of (list of ingredient dictionaries, after_id of the next page
+        or None)
+    """
+    next_after_id = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_after_id = rows[-1][0]
+
+    ingredients = _format_ingredients(rows, columns, pending)
+    for column in ('id', 'name'):
+        if column not in fields:
+            for ingredient in ingredients:
+                del ingredient[column]
+    return ingredients, next_after_id
+
+def get_ingredients_page(username, after_id=None, limit=None, fields=INGREDIENT_FIELDS):
+    """
+    Get one page of a user's pantry, newest first, using keyset pagination.
+
+    Args:
+        username: Owner of the pantry
+        after_id: next_after_id from the previous page, or None for the first
+        limit: Page size (None for everything after ``after_id``)
+        fields: Subset of INGREDIENT_FIELDS to return
+
+    Returns:
+        Tuple of (list of ingredient dictionaries, after_id of the next page
+        or None)
+
+    Raises:
+        ValueError: If ``fields`` names an unknown field
+    """
+    query, params, columns = ingredients_page_query(username, after_id, limit, fields)
+    # Before the query, as in get_ingredients()
+    pending = write_behind.pending(username)
+
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-    user = cursor.fetchone()
-    
-    if not user:
-        conn.close()
-        return {"error": "User not found"}
-    
-    for ingredient in ingredients:
-        cursor.execute("INSERT INTO ingredients (username, ingredient) VALUES (?, ?)", (username, ingredient))
-    
-    conn.commit()
+    cursor.row_factory = None
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
     conn.close()
-    return {"message": "Ingredients added successfully"}
 
-def get_ingredients(username):
-    conn = sqlite3.connect('food_planner.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT ingredient FROM ingredients WHERE username = ?", (username,))
-    ingredients = [row[0] for row in cursor.fetchall()]
+    return ingredients_page_result(rows, columns, fields, limit, pending)
+
+COUNT_INGREDIENTS_SQL = "SELECT COUNT(*) FROM ingredients WHERE username = ?"
+
+def count_ingredients(username):
+    """Number of items in a user's pantry (an index-only count)."""
+    conn = get_connection()
+    count = conn.execute(COUNT_INGREDIENTS_SQL, (username,)).fetchone()[0]
     conn.close()
-    
-    return {"ingredients": ingredients}
+    return count
+
+def _pantry_version(cursor, username):
+    cursor.execute("SELECT version FROM pantry_versions WHERE username = ?", (username,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def compact_pantry_changes(cursor, username):
+    """
+    Shrink a user's change log: drop entries superseded by a newer entry for
+    the same item, and tombstones past TOMBSTONE_RETENTION_DAYS.
+
+    Dropping tombstones raises the user's min_version; changes requests
+    from before it are answered with a full reset.
+    """
+    cursor.execute(
+        """
+        DELETE FROM pantry_changes
+        WHERE username = ? AND version NOT IN (
+            SELECT MAX(version) FROM pantry_changes WHERE username = ? GROUP BY item_id
+        )
+        """,
+        (username, username)
+    )
+    superseded = cursor.rowcount
+
+    cursor.execute(
+        """
+        SELECT MAX(version) FROM pantry_changes
+        WHERE username = ? AND deleted = 1 AND changed_at < datetime('now', ?)
+        """,
+        (username, f"-{TOMBSTONE_RETENTION_DAYS} days")
+    )
+    horizon = cursor.fetchone()[0]
+    if horizon is not None:
+        cursor.execute(
+            "DELETE FROM pantry_changes WHERE username = ? AND deleted = 1 AND version <= ?",
+            (username, horizon)
+        )
+        cursor.execute(
+            "UPDATE pantry_versions SET min_version = MAX(min_version, ?) WHERE username = ?",
+            (horizon, username)
+        )
+    logger.debug(f"Compacted pantry log of '{username}': {superseded} superseded entries removed")
+
+def _compact_if_due(cursor, username, version_before):
+    version = _pantry_version(cursor, username)
+    if version // PANTRY_COMPACT_INTERVAL > version_before // PANTRY_COMPACT_INTERVAL:
+        compact_pantry_changes(cursor, username)
+
+def compact_all_pantry_changes():
+    """
+    Compact every user's change log.
+
+    Returns:
+        Number of users processed
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT username FROM pantry_versions")
+        usernames = [row[0] for row in cursor.fetchall()]
+        for username in usernames:
+            cursor.execute("BEGIN IMMEDIATE")
+            compact_pantry_changes(cursor, username)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return len(usernames)
+
+def get_pantry_changes(username, since):
+    """
+    Get what changed in a user's pantry after version ``since``.
+
+    Args:
+        username: Owner of the pantry
+        since: Version the client last synced to (0 for a full sync)
+
+    Returns:
+        Dict with the current ``version``, ``reset`` (True if the client must
+        replace its copy because ``since`` is too old or unknown) and
+        ``changes``: items as {"id", "name", "checked"} or tombstones as
+        {"id", "name", "deleted": True}, oldest first
+    """
+    # Buffered toggles get their versions before the client is told the current one
+    write_behind.flush(username)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+
+    try:
+        # One read snapshot, so the version matches the changes returned
+        cursor.execute("BEGIN")
+        cursor.execute("SELECT version, min_version FROM pantry_versions WHERE username = ?", (username,))
+        row = cursor.fetchone()
+        version, min_version = row if row else (0, 0)
+
+        reset = since < min_version or since > version
+        cursor.execute(
+            """
+            SELECT version, item_id, name, checked, deleted FROM pantry_changes
+            WHERE username = ? AND version > ?
+            ORDER BY version
+            """,
+            (username, 0 if reset else since)
+        )
+        rows = cursor.fetchall()
+    finally:
+        conn.rollback()
+        conn.close()
+
+    # Only the newest entry per item matters; dicts keep the last insertion
+    # position, so re-inserting moves an item to its newest version
+    latest = {}
+    for _, item_id, name, checked, deleted in rows:
+        latest.pop(item_id, None)
+        if deleted:
+            latest[item_id] = {'id': item_id, 'name': name, 'deleted': True}
+        else:
+            latest[item_id] = {'id': item_id, 'name': name, 'checked': bool(checked)}
+
+    changes = list(latest.values())
+    if reset:
+        changes = [change for change in changes if not change.get('deleted')]
+    return {'version': version, 'reset': reset, 'changes': changes}
+
+def add_ingredients(username, items):
+    """
+    Add ingredients to a user's pantry in one statement batch.
+
+    Names the user already has are folded into the existing row by the
+    unique (username, name) index.
+
+    Args:
+        username: Owner of the pantry (must exist)
+        items: List of (name, checked) pairs
+
+    Returns:
+        Number of rows inserted
+    """
+    # Buffered toggles were made before this write and must land first
+    write_behind.flush(username)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        version_before = _pantry_version(cursor, username)
+        ingredient_ids = resolve_ingredient_ids(cursor, [name for name, _ in items])
+        cursor.executemany(
+            """
+            INSERT INTO ingredients (username, name, checked, ingredient_id)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (username, name) DO NOTHING
+            """,
+            [(username, name, checked, ingredient_ids[name]) for name, checked in items]
+        )
+        inserted = cursor.rowcount
+        _compact_if_due(cursor, username, version_before)
+        conn.commit()
+        if inserted:
+            suggestion_state.pantry_changed(conn, username)
+    finally:
+        conn.close()
+
+    return inserted
+
+def remove_ingredient(username, name):
+    """
+    Remove one item from a user's pantry.
+
+    Returns:
+        Number of rows deleted
+    """
+    write_behind.flush(username)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        version_before = _pantry_version(cursor, username)
+        cursor.execute(
+            "DELETE FROM ingredients WHERE username = ? AND name = ?",
+            (username, name)
+        )
+        deleted = cursor.rowcount
+        _compact_if_due(cursor, username, version_before)
+        conn.commit()
+        if deleted:
+            suggestion_state.pantry_changed(conn, username)
+    finally:
+        conn.close()
+
+    return deleted
+
+def _write_statuses(cursor, username, statuses):
+    # Two bound parameters per CASE branch plus one per IN entry
+    updated = 0
+    batch_size = SQL_BATCH_SIZE // 3
+    for start in range(0, len(statuses), batch_size):
+        batch = statuses[start:start + batch_size]
+        cases = ' '.join(['WHEN ? THEN ?'] * len(batch))
+        placeholders = ','.join(['?'] * len(batch))
+        params = [value for name, checked in batch for value in (name, checked)]
+        params.append(username)
+        params.extend(name for name, _ in batch)
+        cursor.execute(
+            f"""
+            UPDATE ingredients
+            SET checked = CASE name {cases} END
+            WHERE username = ? AND name IN ({placeholders})
+            """,
+            params
+        )
+        updated += cursor.rowcount
+    return updated
+
+def update_ingredient_status(username, items):
+    """
+    Set the checked flag of several pantry items with one UPDATE per batch.
+
+    With write-behind enabled the update is only buffered (see
+    write_behind.py) and written with other pending updates shortly after.
+
+    Suggestions match on every pantry item whether checked or not, so the
+    suggestion state is left alone.
+
+    Args:
+        username: Owner of the pantry
+        items: List of (name, checked) pairs; the last value wins for duplicates
+
+    Returns:
+        Number of rows updated, or of updates buffered
+    """
+    statuses = dict(items)
+
+    if write_behind.enabled():
+        write_behind.enqueue(username, statuses)
+        return len(statuses)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        version_before = _pantry_version(cursor, username)
+        updated = _write_statuses(cursor, username, list(statuses.items()))
+        _compact_if_due(cursor, username, version_before)
+        conn.commit()
+    finally:
+        conn.close()
+
+    return updated
+
+def _flush_statuses(pending):
+    """write_behind writer: apply buffered statuses of many users in one transaction."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        updated = 0
+        for username, statuses in pending.items():
+            version_before = _pantry_version(cursor, username)
+            updated += _write_statuses(cursor, username, list(statuses.items()))
+            _compact_if_due(cursor, username, version_before)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    logger.debug(f"Flushed {updated} buffered status updates for {len(pending)} users")
+
+write_behind.set_writer(_flush_statuses)
@@ -0,0 +1,115 @@
+# load_test.py
+#
+# Small load generator for comparing the WSGI (gunicorn) and ASGI (uvicorn)
+# servers under many concurrent, slow clients.
+#
+#   python load_test.py --url http://127.0.0.1:5000 --path "/api/recipes/suggest?username=alice" \
+#       [--concurrency 200] [--requests 2000] [--slow-ms 200]
+#
+# Each client opens its own connection and, with --slow-ms, trickles the
+# request in two halves with a pause in between, the way clients on slow
+# mobile links do. Reports throughput and latency percentiles as JSON.
+import argparse
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def _request(host, port, path, slow_ms):
+    request = (
+        f"GET {path} HTTP/1.1\r\n"
+        f"Host: {host}:{port}\r\n"
+        "Connection: close\r\n"
+        "\r\n"
+    ).encode()
+
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        if slow_ms:
+            half = len(request) // 2
+            writer.write(request[:half])
+            await writer.drain()
+            await asyncio.sleep(slow_ms / 1000)
+            writer.write(request[half:])
+        else:
+            writer.write(request)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        await reader.read()
+    finally:
+        writer.close()
+    return int(status_line.split()[1]), time.perf_counter() - started
+
+async def run(url, path, concurrency, total, slow_ms):
+    """
+    Send ``total`` GET requests with at most ``concurrency`` in flight.
+
+    Returns:
+        Dict with request counts, throughput and latency percentiles in ms
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    latencies = []
+    statuses = {}
+    failures = 0
+    remaining = iter(range(total))
+
+    async def client():
+        nonlocal failures
+        for _ in remaining:
+            try:
+                status, elapsed = await _request(host, port, path, slow_ms)
+            except (OSError, ValueError, IndexError) as e:
+                failures += 1
+                logger.debug(f"Request failed: {e}")
+                continue
+            statuses[status] = statuses.get(status, 0) + 1
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "url": url + path,
+        "concurrency": concurrency,
+        "requests": total,
+        "slow_ms": slow_ms,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "failures": failures,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            name: round(percentile(latencies, fraction) * 1000, 1) if latencies else None
+            for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+        }
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a running Food Planner API server")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="Server base URL")
+    parser.add_argument('--path', default='/api/recipes/search?query=toast', help="Request path")
+    parser.add_argument('--concurrency', type=int, default=100, help="Concurrent clients")
+    parser.add_argument('--requests', type=int, default=1000, help="Total requests")
+    parser.add_argument('--slow-ms', type=int, default=0,
+                        help="Pause between the two halves of each request, in ms")
+    args = parser.parse_args(argv)
+
+    stats = asyncio.run(run(args.url, args.path, args.concurrency, args.requests, args.slow_ms))
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,190 @@
+# metrics.py
+#
+# Request and SQL instrumentation, exported in the Prometheus text format
+# (served at /api/metrics).
+#
+# Per route: a latency histogram, request counts by status, and histograms
+# of the number of SQL statements and the SQL time per request, so slow
+# requests can be split into time spent in SQLite and time spent in Python.
+# Also exported: a histogram of individual statement durations, connections
+# opened, and the hit/miss counters of every cache in cache.py.
+#
+# FOOD_PLANNER_SLOW_QUERY_MS logs statements slower than the given number of
+# milliseconds together with their EXPLAIN QUERY PLAN output.
+import contextvars
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from cache import cache_stats
+from db import connections_opened, set_statement_observer
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+STATEMENT_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+# Threshold for the slow-query log in seconds; None disables it
+SLOW_QUERY_SECONDS = (
+    float(os.environ['FOOD_PLANNER_SLOW_QUERY_MS']) / 1000
+    if os.environ.get('FOOD_PLANNER_SLOW_QUERY_MS') else None
+)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        """Exposition lines; ``labels`` is empty or ends with a comma."""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels}le="+Inf"}} {self.count}'
+        suffix = f'{{{labels.rstrip(",")}}}' if labels else ''
+        yield f'{name}_sum{suffix} {self.sum}'
+        yield f'{name}_count{suffix} {self.count}'
+
+_lock = threading.Lock()
+# (method, route) -> {'latency', 'statements', 'sql_seconds'} histograms
+_routes = {}
+# (method, route, status) -> count
+_responses = {}
+_statements = Histogram(STATEMENT_BUCKETS)
+
+# SQL totals of the request being handled in the current context; handlers
+# that hop to a thread pool (asgi.py) carry the context with them
+_current = contextvars.ContextVar('food_planner_request_sql', default=None)
+
+def _explain(cursor, sql, params):
+    try:
+        # The base-class execute() is not observed, so this cannot recurse
+        rows = sqlite3.Connection.execute(cursor.connection, f"EXPLAIN QUERY PLAN {sql}", params or ())
+        return '; '.join(row[-1] for row in rows)
+    except sqlite3.Error as e:
+        return f"unavailable ({e})"
+
+def _observe_statement(cursor, sql, params, seconds):
+    request_sql = _current.get()
+    if request_sql is not None:
+        request_sql[0] += 1
+        request_sql[1] += seconds
+    with _lock:
+        _statements.observe(seconds)
+
+    if SLOW_QUERY_SECONDS is not None and seconds >= SLOW_QUERY_SECONDS:
+        statement = ' '.join(sql.split())
+        plan = _explain(cursor, sql, params) if params is not None else "not captured for executemany"
+        logger.warning(f"Slow query ({seconds * 1000:.1f} ms): {statement} | plan: {plan}")
+
+set_statement_observer(_observe_statement)
+
+def start_request():
+    """
+    Begin collecting SQL totals for a request.
+
+    Returns:
+        Token to pass to finish_request()
+    """
+    return time.perf_counter(), _current.set([0, 0.0])
+
+def finish_request(token, method, route, status):
+    """
+    Record a finished request.
+
+    Args:
+        token: Value returned by start_request()
+        route: Route pattern (not the concrete path, to bound label cardinality)
+        status: HTTP status code
+    """
+    started, context_token = token
+    elapsed = time.perf_counter() - started
+    statements, sql_seconds = _current.get()
+    _current.reset(context_token)
+
+    with _lock:
+        route_metrics = _routes.get((method, route))
+        if route_metrics is None:
+            route_metrics = _routes[(method, route)] = {
+                'latency': Histogram(LATENCY_BUCKETS),
+                'statements': Histogram(STATEMENT_COUNT_BUCKETS),
+                'sql_seconds': Histogram(LATENCY_BUCKETS),
+            }
+        route_metrics['latency'].observe(elapsed)
+        route_metrics['statements'].observe(statements)
+        route_metrics['sql_seconds'].observe(sql_seconds)
+        key = (method, route, status)
+        _responses[key] = _responses.get(key, 0) + 1
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        lines.append("# HELP food_planner_request_duration_seconds Request latency by route")
+        lines.append("# TYPE food_planner_request_duration_seconds histogram")
+        for (method, route), route_metrics in sorted(_routes.items()):
+            labels = f'method="{method}",route="{_label(route)}",'
+            lines.extend(route_metrics['latency'].lines('food_planner_request_duration_seconds', labels))
+
+        lines.append("# HELP food_planner_request_sql_statements SQL statements executed per request")
+        lines.append("# TYPE food_planner_request_sql_statements histogram")
+        for (method, route), route_metrics in sorted(_routes.items()):
+            labels = f'method="{method}",route="{_label(route)}",'
+            lines.extend(route_metrics['statements'].lines('food_planner_request_sql_statements', labels))
+
+        lines.append("# HELP food_planner_request_sql_seconds Time spent executing SQL per request")
+        lines.append("# TYPE food_planner_request_sql_seconds histogram")
+        for (method, route), route_metrics in sorted(_routes.items()):
+            labels = f'method="{method}",route="{_label(route)}",'
+            lines.extend(route_metrics['sql_seconds'].lines('food_planner_request_sql_seconds', labels))
+
+        lines.append("# HELP food_planner_requests_total Requests by route and status")
+        lines.append("# TYPE food_planner_requests_total counter")
+        for (method, route, status), count in sorted(_responses.items()):
+            lines.append(
+                f'food_planner_requests_total{{method="{method}",route="{_label(route)}",status="{status}"}} {count}'
+            )
+
+        lines.append("# HELP food_planner_sql_statement_seconds Duration of individual SQL statements")
+        lines.append("# TYPE food_planner_sql_statement_seconds histogram")
+        lines.extend(_statements.lines('food_planner_sql_statement_seconds', ''))
+
+    lines.append("# HELP food_planner_db_connections_opened_total Database connections opened")
+    lines.append("# TYPE food_planner_db_connections_opened_total counter")
+    lines.append(f"food_planner_db_connections_opened_total {connections_opened()}")
+
+    caches = cache_stats()
+    for metric, key, kind, help_text in (
+        ('food_planner_cache_hits_total', 'hits', 'counter', "Cache hits"),
+        ('food_planner_cache_misses_total', 'misses', 'counter', "Cache misses"),
+        ('food_planner_cache_entries', 'size', 'gauge', "Entries currently cached"),
+        ('food_planner_cache_hit_ratio', 'hit_rate', 'gauge', "Hits per lookup since start-up"),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, stats in sorted(caches.items()):
+            value = 'NaN' if stats[key] is None else stats[key]
+            lines.append(f'{metric}{{cache="{_label(name)}"}} {value}')
+
+    return '\n'.join(lines) + '\n'
@@ -1,52 +1,318 @@
 # migration.py
-import sqlite3
+#
+# Versioned schema migrations. The current schema version is stored in
+# PRAGMA user_version; migrate_database() applies every pending step in a
+# single transaction, so a failed step leaves the database untouched.
+import logging
+from db import get_connection
+from ingredient_dictionary import resolve_ingredient_ids, seed_aliases
+from ingredients_db import PANTRY_CHANGE_LOG_SQL, PANTRY_CHANGE_TRIGGERS
+from recipes_db import SEARCH_INDEX_SQL, SEARCH_TRIGGERS, rebuild_search_index
 
-def migrate_database():
-    conn = sqlite3.connect('food_planner.db')
-    cursor = conn.cursor()
-    
-    # Check if email column exists
+logger = logging.getLogger(__name__)
+
+def _create_base_schema(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ingredients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        name TEXT NOT NULL,
+        checked BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (username) REFERENCES users (username)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS recipes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        description TEXT,
+        preparation_time INTEGER,
+        cooking_time INTEGER,
+        servings INTEGER,
+        difficulty TEXT,
+        image_url TEXT,
+        instructions TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS recipe_ingredients (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        recipe_id INTEGER NOT NULL,
+        ingredient TEXT NOT NULL,
+        quantity TEXT,
+        unit TEXT,
+        FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_favorite_recipes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        recipe_id INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (username) REFERENCES users (username),
+        FOREIGN KEY (recipe_id) REFERENCES recipes (id)
+    )
+    ''')
+
+def _add_user_email(cursor):
+    # Databases created before signup asked for an email
     cursor.execute("PRAGMA table_info(users)")
-    columns = cursor.fetchall()
-    column_names = [column[1] for column in columns]
-    
-    if 'email' not in column_names:
-        print("Adding email column to users table...")
-        
-        # Create a temporary table with the new schema
-        cursor.execute('''
-        CREATE TABLE users_new (
-            username TEXT PRIMARY KEY,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Get existing users
-        cursor.execute("SELECT username, password, created_at FROM users")
-        users = cursor.fetchall()
-        
-        # Insert users into new table with default email
-        for user in users:
-            username, password, created_at = user
-            default_email = f"{username}@example.com"
-            
-            cursor.execute(
-                "INSERT INTO users_new (username, email, password, created_at) VALUES (?, ?, ?, ?)",
-                (username, default_email, password, created_at)
-            )
-        
-        # Drop old table and rename new one
-        cursor.execute("DROP TABLE users")
-        cursor.execute("ALTER TABLE users_new RENAME TO users")
-        
-        print(f"Migration complete. {len(users)} users updated with default emails.")
-    else:
-        print("Email column already exists. No migration needed.")
-    
-    conn.commit()
-    conn.close()
+    column_names = [column[1] for column in cursor.fetchall()]
+
+    if 'email' in column_names:
+        return
+
+    logger.info("Adding email column to users table...")
+
+    # Create a temporary table with the new schema
+    cursor.execute('''
+    CREATE TABLE users_new (
+        username TEXT PRIMARY KEY,
+        email TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # Copy existing users with a default email
+    cursor.execute('''
+    INSERT INTO users_new (username, email, password, created_at)
+    SELECT username, username || '@example.com', password, created_at FROM users
+    ''')
+    user_count = cursor.rowcount
+
+    # Drop old table and rename new one
+    cursor.execute("DROP TABLE users")
+    cursor.execute("ALTER TABLE users_new RENAME TO users")
+
+    logger.info(f"{user_count} users updated with default emails")
+
+def _add_lookup_indexes(cursor):
+    # Pantry listing: WHERE username = ? ORDER BY created_at
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_ingredients_username_created_at
+    ON ingredients (username, created_at)
+    ''')
+
+    # Recipe detail and per-recipe ingredient lookups
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe_id
+    ON recipe_ingredients (recipe_id)
+    ''')
+
+    # Case-insensitive ingredient matching
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient_lower
+    ON recipe_ingredients (lower(ingredient))
+    ''')
+
+    # A recipe can only be favorited once per user; drop existing duplicates first
+    cursor.execute('''
+    DELETE FROM user_favorite_recipes
+    WHERE id NOT IN (
+        SELECT MIN(id) FROM user_favorite_recipes GROUP BY username, recipe_id
+    )
+    ''')
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_user_favorite_recipes_username_recipe_id
+    ON user_favorite_recipes (username, recipe_id)
+    ''')
+
+def _add_ingredient_dictionary(cursor):
+    # Canonical ingredient names; plurals and synonyms point at them via aliases
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ingredient_dictionary (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS ingredient_aliases (
+        alias TEXT PRIMARY KEY,
+        ingredient_id INTEGER NOT NULL,
+        FOREIGN KEY (ingredient_id) REFERENCES ingredient_dictionary (id)
+    )
+    ''')
+
+    cursor.execute('''
+    ALTER TABLE recipe_ingredients
+    ADD COLUMN ingredient_id INTEGER REFERENCES ingredient_dictionary (id)
+    ''')
+    cursor.execute('''
+    ALTER TABLE ingredients
+    ADD COLUMN ingredient_id INTEGER REFERENCES ingredient_dictionary (id)
+    ''')
+
+    seed_aliases(cursor)
+
+    # Backfill ids for existing rows; names are singularized the same way as
+    # new ones, IRREGULAR_PLURALS included ("cookies" -> "cookie")
+    cursor.execute("SELECT DISTINCT ingredient FROM recipe_ingredients")
+    recipe_names = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT DISTINCT name FROM ingredients")
+    pantry_names = [row[0] for row in cursor.fetchall()]
+    ids = resolve_ingredient_ids(cursor, recipe_names + pantry_names)
+
+    cursor.executemany(
+        "UPDATE recipe_ingredients SET ingredient_id = ? WHERE ingredient = ?",
+        [(ids[name], name) for name in recipe_names],
+    )
+    cursor.executemany(
+        "UPDATE ingredients SET ingredient_id = ? WHERE name = ?",
+        [(ids[name], name) for name in pantry_names],
+    )
+
+    # Matching now joins on ingredient ids instead of lower(ingredient)
+    cursor.execute("DROP INDEX IF EXISTS idx_recipe_ingredients_ingredient_lower")
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient_id
+    ON recipe_ingredients (ingredient_id, recipe_id)
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_ingredients_username_ingredient_id
+    ON ingredients (username, ingredient_id)
+    ''')
+
+def _add_unique_pantry_names(cursor):
+    # Fold duplicate pantry rows into the oldest one so bulk adds can upsert
+    cursor.execute('''
+    DELETE FROM ingredients
+    WHERE id NOT IN (
+        SELECT MIN(id) FROM ingredients GROUP BY username, name
+    )
+    ''')
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_ingredients_username_name
+    ON ingredients (username, name)
+    ''')
+
+def _add_recipe_external_id(cursor):
+    # Stable id from the source catalog so bulk re-imports update in place
+    cursor.execute("ALTER TABLE recipes ADD COLUMN external_id TEXT")
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_recipes_external_id
+    ON recipes (external_id)
+    ''')
+
+def _add_recipe_search_index(cursor):
+    cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+    if not cursor.fetchone()[0]:
+        logger.warning("SQLite was built without FTS5; recipe search falls back to LIKE")
+        return
+
+    cursor.execute(SEARCH_INDEX_SQL)
+    for create_sql in SEARCH_TRIGGERS.values():
+        cursor.execute(create_sql)
+    rebuild_search_index(cursor)
+
+def _add_catalog_state(cursor):
+    # Single-row version counter bumped by every recipe write; readers in any
+    # process poll it to invalidate their recipe caches
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS catalog_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO catalog_state (id, version) VALUES (1, 1)")
+
+def _add_pantry_keyset_index(cursor):
+    # Pantry listings page by id (newest first) instead of created_at
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_ingredients_username_id
+    ON ingredients (username, id)
+    ''')
+    cursor.execute("DROP INDEX IF EXISTS idx_ingredients_username_created_at")
+
+def _add_pantry_change_log(cursor):
+    for create_sql in PANTRY_CHANGE_LOG_SQL:
+        cursor.execute(create_sql)
+
+    # Log every existing pantry row as an insert so a sync from version 0
+    # returns the whole pantry
+    cursor.execute('''
+    INSERT INTO pantry_changes (username, version, item_id, name, checked)
+    SELECT username, ROW_NUMBER() OVER (PARTITION BY username ORDER BY id), id, name, checked
+    FROM ingredients
+    ''')
+    cursor.execute('''
+    INSERT INTO pantry_versions (username, version)
+    SELECT username, COUNT(*) FROM ingredients GROUP BY username
+    ''')
+
+    for create_sql in PANTRY_CHANGE_TRIGGERS.values():
+        cursor.execute(create_sql)
+
+# (version, description, step) in the order they must be applied.
+# Never edit a released step; append a new one instead.
+MIGRATIONS = [
+    (1, "Create base schema", _create_base_schema),
+    (2, "Add email column to users", _add_user_email),
+    (3, "Add lookup indexes", _add_lookup_indexes),
+    (4, "Add ingredient dictionary", _add_ingredient_dictionary),
+    (5, "Make pantry names unique per user", _add_unique_pantry_names),
+    (6, "Add recipe external ids", _add_recipe_external_id),
+    (7, "Add full-text recipe search", _add_recipe_search_index),
+    (8, "Add catalog version counter", _add_catalog_state),
+    (9, "Index pantry listings by id", _add_pantry_keyset_index),
+    (10, "Add pantry change log", _add_pantry_change_log),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate_database():
+    """
+    Apply pending migrations.
+
+    Returns:
+        The schema version after migrating
+    """
+    conn = get_connection()
+    try:
+        version = get_schema_version(conn)
+        pending = [m for m in MIGRATIONS if m[0] > version]
+        if not pending:
+            return version
+
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        for step_version, description, step in pending:
+            logger.info(f"Applying migration {step_version}: {description}")
+            step(cursor)
+
+        # Refresh planner statistics for the new indexes
+        cursor.execute("ANALYZE")
+        cursor.execute(f"PRAGMA user_version = {LATEST_VERSION}")
+        conn.commit()
+
+        logger.info(f"Database migrated from version {version} to {LATEST_VERSION}")
+        return LATEST_VERSION
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
-    migrate_database()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO)
+    migrate_database()
@@ -0,0 +1,308 @@
+# recipe_import.py
+#
+# Streaming bulk loader for recipe catalogs in CSV or JSON Lines format.
+#
+#   python recipe_import.py catalog.jsonl [--batch-size 2000] [--defer-indexes]
+#
+# Each record needs an external_id; importing the same file again updates the
+# recipes in place instead of duplicating them. CSV files list ingredients in
+# one "ingredients" column separated by "|". JSONL records may give
+# ingredients as names or as {"ingredient", "quantity", "unit"} objects.
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+from db import SQL_BATCH_SIZE, get_connection
+from ingredient_dictionary import resolve_ingredient_ids
+from migration import migrate_database
+from recipes_db import (
+    SEARCH_TRIGGERS, bump_catalog_version, rebuild_search_index, refresh_catalog, search_index_available
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+RECIPE_COLUMNS = (
+    'external_id', 'name', 'description', 'preparation_time', 'cooking_time',
+    'servings', 'difficulty', 'image_url', 'instructions',
+)
+INTEGER_COLUMNS = ('preparation_time', 'cooking_time', 'servings')
+
+# Indexes only needed for reads; dropped during deferred loads and rebuilt at the end
+DEFERRABLE_INDEXES = {
+    'idx_recipe_ingredients_ingredient_id':
+        'CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient_id '
+        'ON recipe_ingredients (ingredient_id, recipe_id)',
+}
+
+CSV_INGREDIENT_SEPARATOR = '|'
+
+def detect_format(filename):
+    """Guess 'csv' or 'jsonl' from a file name."""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    return None
+
+def read_records(stream, fmt):
+    """
+    Yield raw records from a text stream, one at a time.
+
+    CSV rows are yielded as dicts and JSONL lines as undecoded strings, so a
+    malformed line is skipped by parse_records() instead of ending the import.
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield line
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+def _parse_int(value):
+    if value is None or value == '':
+        return None
+    return int(value)
+
+def parse_record(raw):
+    """
+    Validate a raw record and convert it to the shape the loader writes.
+
+    Raises:
+        ValueError: If the record is missing required fields
+    """
+    external_id = raw.get('external_id')
+    name = raw.get('name')
+    if external_id in (None, '') or not name:
+        raise ValueError("external_id and name are required")
+
+    ingredients = raw.get('ingredients') or []
+    if isinstance(ingredients, str):
+        ingredients = [i.strip() for i in ingredients.split(CSV_INGREDIENT_SEPARATOR)]
+
+    parsed_ingredients = []
+    for ingredient in ingredients:
+        if isinstance(ingredient, dict):
+            ingredient_name = ingredient.get('ingredient') or ingredient.get('name')
+            quantity, unit = ingredient.get('quantity'), ingredient.get('unit')
+        else:
+            ingredient_name, quantity, unit = ingredient, None, None
+        if ingredient_name:
+            parsed_ingredients.append((ingredient_name, quantity, unit))
+
+    instructions = raw.get('instructions') or ''
+    if isinstance(instructions, list):
+        instructions = '\n'.join(instructions)
+
+    record = {column: raw.get(column) for column in RECIPE_COLUMNS}
+    record['external_id'] = str(external_id)
+    record['instructions'] = instructions
+    for column in INTEGER_COLUMNS:
+        record[column] = _parse_int(record[column])
+    record['ingredients'] = parsed_ingredients
+    return record
+
+def parse_records(raw_records, errors):
+    """Parse records lazily, counting (and logging) invalid ones in ``errors``."""
+    for line_number, raw in enumerate(raw_records, start=1):
+        try:
+            if isinstance(raw, str):
+                raw = json.loads(raw)
+            yield parse_record(raw)
+        except (json.JSONDecodeError, ValueError, TypeError, AttributeError) as e:
+            errors['skipped'] += 1
+            logger.warning(f"Skipping record {line_number}: {e}")
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _write_batch(cursor, batch, ingredient_ids):
+    # The last occurrence of an external_id within a batch wins
+    batch = list({record['external_id']: record for record in batch}.values())
+
+    # ingredient_ids carries names resolved by earlier batches of this import
+    unknown = {name for record in batch for name, _, _ in record['ingredients']} - ingredient_ids.keys()
+    if unknown:
+        ingredient_ids.update(resolve_ingredient_ids(cursor, unknown))
+
+    cursor.executemany(
+        """
+        INSERT INTO recipes (external_id, name, description, preparation_time, cooking_time,
+                             servings, difficulty, image_url, instructions)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (external_id) DO UPDATE SET
+            name = excluded.name,
+            description = excluded.description,
+            preparation_time = excluded.preparation_time,
+            cooking_time = excluded.cooking_time,
+            servings = excluded.servings,
+            difficulty = excluded.difficulty,
+            image_url = excluded.image_url,
+            instructions = excluded.instructions
+        """,
+        [tuple(record[column] for column in RECIPE_COLUMNS) for record in batch]
+    )
+
+    recipe_ids = {}
+    external_ids = [record['external_id'] for record in batch]
+    for start in range(0, len(external_ids), SQL_BATCH_SIZE):
+        chunk = external_ids[start:start + SQL_BATCH_SIZE]
+        placeholders = ','.join(['?'] * len(chunk))
+        cursor.execute(
+            f"SELECT id, external_id FROM recipes WHERE external_id IN ({placeholders})", chunk
+        )
+        recipe_ids.update((row['external_id'], row['id']) for row in cursor.fetchall())
+
+    # Replace the ingredient lists of re-imported recipes
+    ids = list(recipe_ids.values())
+    for start in range(0, len(ids), SQL_BATCH_SIZE):
+        chunk = ids[start:start + SQL_BATCH_SIZE]
+        placeholders = ','.join(['?'] * len(chunk))
+        cursor.execute(f"DELETE FROM recipe_ingredients WHERE recipe_id IN ({placeholders})", chunk)
+
+    cursor.executemany(
+        """
+        INSERT INTO recipe_ingredients (recipe_id, ingredient, quantity, unit, ingredient_id)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [
+            (recipe_ids[record['external_id']], name, quantity, unit, ingredient_ids[name])
+            for record in batch
+            for name, quantity, unit in record['ingredients']
+        ]
+    )
+
+def import_recipes(records, batch_size=DEFAULT_BATCH_SIZE, defer_indexes=False, rebuild_index=True):
+    """
+    Load parsed recipe records into the catalog.
+
+    Records are consumed lazily and written in one transaction per batch, so
+    memory use does not depend on the size of the input.
+
+    Args:
+        records: Iterable of records from parse_record()
+        batch_size: Recipes per transaction
+        defer_indexes: Drop read-only indexes during the load and rebuild
+            them afterwards; fastest for large initial loads
+        rebuild_index: Refresh this process's in-memory recipe index
+
+    Returns:
+        Dict with the number of recipes imported, elapsed seconds and rows/sec
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    search_enabled = search_index_available(conn)
+
+    imported = 0
+    ingredient_ids = {}
+    started = time.perf_counter()
+    try:
+        if defer_indexes:
+            for index_name in DEFERRABLE_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+            if search_enabled:
+                # Per-row trigger maintenance is replaced by one rebuild at the end
+                for trigger_name in SEARCH_TRIGGERS:
+                    cursor.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+            conn.commit()
+
+        for batch in batched(records, batch_size):
+            cursor.execute("BEGIN IMMEDIATE")
+            _write_batch(cursor, batch, ingredient_ids)
+            bump_catalog_version(cursor)
+            conn.commit()
+
+            imported += len(batch)
+            elapsed = time.perf_counter() - started
+            logger.info(f"Imported {imported} recipes ({imported / elapsed:.0f} rows/sec)")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if defer_indexes:
+            logger.info("Rebuilding deferred indexes")
+            for create_sql in DEFERRABLE_INDEXES.values():
+                cursor.execute(create_sql)
+            if search_enabled:
+                for create_sql in SEARCH_TRIGGERS.values():
+                    cursor.execute(create_sql)
+                rebuild_search_index(cursor)
+            cursor.execute("ANALYZE")
+            conn.commit()
+        conn.close()
+
+    if imported and rebuild_index:
+        # Pick up the new recipes in this process's index and caches; other
+        # processes notice the version bump on their next poll
+        refresh_catalog()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "imported": imported,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(imported / elapsed) if elapsed else imported
+    }
+
+def import_stream(stream, fmt, batch_size=DEFAULT_BATCH_SIZE, defer_indexes=False, rebuild_index=True):
+    """
+    Import recipes from a binary or text stream.
+
+    Returns:
+        import_recipes() statistics plus the number of skipped records
+    """
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+    errors = {'skipped': 0}
+    records = parse_records(read_records(text, fmt), errors)
+    stats = import_recipes(records, batch_size, defer_indexes, rebuild_index)
+    stats['skipped'] = errors['skipped']
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import recipes from CSV or JSONL")
+    parser.add_argument('path', help="File to import, or - for stdin")
+    parser.add_argument('--format', choices=('csv', 'jsonl'),
+                        help="Input format (default: from the file extension)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help="Drop read-only indexes during the load and rebuild them at the end")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        parser.error("Cannot tell the format from the file name; pass --format")
+
+    migrate_database()
+
+    # This process does not serve requests, so there is no index to refresh
+    if args.path == '-':
+        stats = import_stream(sys.stdin, fmt, args.batch_size, args.defer_indexes, rebuild_index=False)
+    else:
+        with open(args.path, encoding='utf-8', newline='') as f:
+            stats = import_stream(f, fmt, args.batch_size, args.defer_indexes, rebuild_index=False)
+
+    logger.info(f"Import finished: {stats}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,100 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# In-process inverted index over recipe_ingredients.
+#
+# _ingredient_recipes maps an ingredient_dictionary id to the recipes using it
+# (recipe_id -> number of times the ingredient is listed), and
+# _recipe_ingredients keeps each recipe's (ingredient_id, lowercased name)
+# pairs in insertion order so suggestions can report matching/missing
+# ingredients without going back to the database.
+#
+# The index is only ever rebuilt as a whole: every write to the recipe tables
+# bumps the catalog version, and recipes_db.refresh_catalog() calls build()
+# when it sees the new version (in this process right after the write, in
+# other processes on their next poll).
+_lock = threading.Lock()
+_built = False
+# Bumped on every build so derived state (suggestion_state) can tell it is stale
+_generation = 0
+_ingredient_recipes = {}
+_recipe_ingredients = {}
+
+def build(conn):
+    """(Re)build the index from the recipe tables."""
+    global _built, _generation, _ingredient_recipes, _recipe_ingredients
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT ri.recipe_id, ri.ingredient_id, ri.ingredient
+        FROM recipe_ingredients ri
+        JOIN recipes r ON r.id = ri.recipe_id
+        ORDER BY ri.recipe_id, ri.id
+    """)
+
+    ingredient_recipes = {}
+    recipe_ingredients = {}
+    for recipe_id, ingredient_id, ingredient in cursor.fetchall():
+        recipe_ingredients.setdefault(recipe_id, []).append((ingredient_id, ingredient.lower()))
+        postings = ingredient_recipes.setdefault(ingredient_id, {})
+        postings[recipe_id] = postings.get(recipe_id, 0) + 1
+
+    with _lock:
+        _ingredient_recipes = ingredient_recipes
+        _recipe_ingredients = recipe_ingredients
+        _built = True
+        _generation += 1
+
+    logger.info(f"Recipe ingredient index built: {len(recipe_ingredients)} recipes, "
+                f"{len(ingredient_recipes)} distinct ingredients")
+
+def ensure_built(conn):
+    """Build the index on first use if startup did not already do it."""
+    if not _built:
+        build(conn)
+
+def generation():
+    """Counter that changes whenever the index does."""
+    return _generation
+
+def count_matches(ingredient_ids):
+    """
+    Count how many of each recipe's ingredients appear in ``ingredient_ids``.
+
+    Only recipes sharing at least one ingredient are returned, so the cost is
+    proportional to the postings of the given ingredients rather than to the
+    size of the catalog.
+
+    Args:
+        ingredient_ids: Set of ingredient_dictionary ids
+
+    Returns:
+        Dict of recipe_id -> number of matching recipe ingredients
+    """
+    counts = {}
+    with _lock:
+        for ingredient_id in ingredient_ids:
+            for recipe_id, occurrences in _ingredient_recipes.get(ingredient_id, {}).items():
+                counts[recipe_id] = counts.get(recipe_id, 0) + occurrences
+    return counts
+
+def recipe_counts():
+    """Dict of ingredient_dictionary id -> number of recipes using it."""
+    with _lock:
+        return {ingredient_id: len(postings) for ingredient_id, postings in _ingredient_recipes.items()}
+
+def recipe_ids():
+    """Ids of every indexed recipe (recipes with at least one ingredient)."""
+    with _lock:
+        return list(_recipe_ingredients)
+
+def snapshot():
+    """(generation, copy of recipe_id -> [(ingredient_id, name)]) taken atomically."""
+    with _lock:
+        return _generation, dict(_recipe_ingredients)
+
+def recipe_ingredients(recipe_id):
+    """(ingredient_id, lowercased name) pairs of a recipe, in the order they were added."""
+    return _recipe_ingredients.get(recipe_id, [])
@@ -1,133 +1,511 @@
+import os
 import sqlite3
+import heapq
 import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import ingredient_vocabulary
+import recipe_index
+import sparse_engine
+import suggestion_state
+from cache import MISSING, LRUCache
+from db import SQL_BATCH_SIZE, get_connection
+from ingredient_dictionary import resolve_ingredient_ids
 
 logger = logging.getLogger(__name__)
 
-def init_recipe_db():
-    """Initialize the recipe database tables if they don't exist."""
-    conn = sqlite3.connect('food_planner.db')
-    cursor = conn.cursor()
+# Full-text search index. recipes_fts rows share their rowid with recipes.id
+# and are kept in sync with recipe writes by SEARCH_TRIGGERS.
+SEARCH_INDEX_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5(
+    name, description, instructions, ingredients,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+_FTS_INGREDIENTS = "(SELECT group_concat(ingredient, ' ') FROM recipe_ingredients WHERE recipe_id = {recipe_id})"
+
+SEARCH_TRIGGERS = {
+    'recipes_fts_after_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_after_insert AFTER INSERT ON recipes BEGIN
+            INSERT INTO recipes_fts (rowid, name, description, instructions, ingredients)
+            VALUES (new.id, new.name, new.description, new.instructions,
+                    {_FTS_INGREDIENTS.format(recipe_id='new.id')});
+        END
+    """,
+    'recipes_fts_after_update': """
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_after_update
+        AFTER UPDATE OF name, description, instructions ON recipes BEGIN
+            UPDATE recipes_fts
+            SET name = new.name, description = new.description, instructions = new.instructions
+            WHERE rowid = new.id;
+        END
+    """,
+    'recipes_fts_after_delete': """
+        CREATE TRIGGER IF NOT EXISTS recipes_fts_after_delete AFTER DELETE ON recipes BEGIN
+            DELETE FROM recipes_fts WHERE rowid = old.id;
+        END
+    """,
+    'recipe_ingredients_fts_after_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS recipe_ingredients_fts_after_insert
+        AFTER INSERT ON recipe_ingredients BEGIN
+            UPDATE recipes_fts SET ingredients = {_FTS_INGREDIENTS.format(recipe_id='new.recipe_id')}
+            WHERE rowid = new.recipe_id;
+        END
+    """,
+    'recipe_ingredients_fts_after_update': f"""
+        CREATE TRIGGER IF NOT EXISTS recipe_ingredients_fts_after_update
+        AFTER UPDATE OF recipe_id, ingredient ON recipe_ingredients BEGIN
+            UPDATE recipes_fts SET ingredients = {_FTS_INGREDIENTS.format(recipe_id='old.recipe_id')}
+            WHERE rowid = old.recipe_id;
+            UPDATE recipes_fts SET ingredients = {_FTS_INGREDIENTS.format(recipe_id='new.recipe_id')}
+            WHERE rowid = new.recipe_id;
+        END
+    """,
+    'recipe_ingredients_fts_after_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS recipe_ingredients_fts_after_delete
+        AFTER DELETE ON recipe_ingredients BEGIN
+            UPDATE recipes_fts SET ingredients = {_FTS_INGREDIENTS.format(recipe_id='old.recipe_id')}
+            WHERE rowid = old.recipe_id;
+        END
+    """,
+}
+
+# bm25 weights for name, description, instructions, ingredients
+SEARCH_COLUMN_WEIGHTS = '10.0, 4.0, 1.0, 5.0'
+
+SEARCH_TOKEN = re.compile(r'\w+')
+
+_search_index_available = None
+
+def search_index_available(conn):
+    """Whether the FTS5 search table exists (SQLite may be built without FTS5)."""
+    global _search_index_available
+    if _search_index_available is None:
+        cursor = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recipes_fts'")
+        _search_index_available = cursor.fetchone() is not None
+    return _search_index_available
+
+def rebuild_search_index(cursor):
+    """Repopulate recipes_fts from the recipe tables."""
+    cursor.execute("DELETE FROM recipes_fts")
+    cursor.execute(f"""
+        INSERT INTO recipes_fts (rowid, name, description, instructions, ingredients)
+        SELECT r.id, r.name, r.description, r.instructions,
+               {_FTS_INGREDIENTS.format(recipe_id='r.id')}
+        FROM recipes r
+    """)
+
+# Read-through caches for catalog data. Entries are dropped whenever the
+# catalog version changes, so the TTLs only bound staleness if a write ever
+# forgets to bump the version.
+RECIPE_CACHE_SIZE = int(os.environ.get('FOOD_PLANNER_RECIPE_CACHE_SIZE', '2048'))
+recipe_cache = LRUCache('recipe', RECIPE_CACHE_SIZE, ttl=3600)
+recipe_summary_cache = LRUCache('recipe_summary', RECIPE_CACHE_SIZE, ttl=3600)
+search_cache = LRUCache('search', 512, ttl=300)
+
+# username -> frozenset of favorite recipe ids. add/remove_favorite_recipe
+# keep this process's entry current; the TTL bounds how long a change made
+# through another process can go unnoticed.
+favorite_ids_cache = LRUCache('favorite_ids', 4096, ttl=30)
+_favorites_lock = threading.Lock()
+
+# How often (seconds) to look for catalog writes made by other processes,
+# such as recipe_import.py
+CATALOG_VERSION_TTL = 2.0
+
+_catalog_lock = threading.Lock()
+_catalog = {'version': None, 'updated_at': None, 'checked_at': 0.0}
+
+def bump_catalog_version(cursor):
+    """Record a recipe write; call inside the writing transaction."""
+    cursor.execute("""
+        UPDATE catalog_state
+        SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = 1
+    """)
+
+def refresh_catalog(conn=None):
+    """
+    Re-read the catalog version and, if it changed, drop cached recipes and
+    rebuild the ingredient index.
     
-    # Create recipes table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS recipes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        description TEXT,
-        preparation_time INTEGER,
-        cooking_time INTEGER,
-        servings INTEGER,
-        difficulty TEXT,
-        image_url TEXT,
-        instructions TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Create recipe_ingredients table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS recipe_ingredients (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        recipe_id INTEGER NOT NULL,
-        ingredient TEXT NOT NULL,
-        quantity TEXT,
-        unit TEXT,
-        FOREIGN KEY (recipe_id) REFERENCES recipes (id)
-    )
-    ''')
-    
-    # Create user_favorite_recipes table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS user_favorite_recipes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT NOT NULL,
-        recipe_id INTEGER NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (username) REFERENCES users (username),
-        FOREIGN KEY (recipe_id) REFERENCES recipes (id)
-    )
-    ''')
+    Returns:
+        Tuple of (version, last modified datetime in UTC)
+    """
+    with _catalog_lock:
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        try:
+            row = conn.execute("SELECT version, updated_at FROM catalog_state WHERE id = 1").fetchone()
+            if row['version'] != _catalog['version']:
+                if _catalog['version'] is not None:
+                    logger.info(f"Catalog changed (version {_catalog['version']} -> {row['version']})")
+                recipe_index.build(conn)
+                ingredient_vocabulary.refresh(conn)
+                recipe_cache.clear()
+                recipe_summary_cache.clear()
+                search_cache.clear()
+                _catalog['version'] = row['version']
+                _catalog['updated_at'] = datetime.strptime(
+                    row['updated_at'], '%Y-%m-%d %H:%M:%S'
+                ).replace(tzinfo=timezone.utc)
+            _catalog['checked_at'] = time.monotonic()
+        finally:
+            if own_conn:
+                conn.close()
+        return _catalog['version'], _catalog['updated_at']
+
+def catalog_version():
+    """
+    Current (version, last modified) of the recipe catalog.
     
-    conn.commit()
-    conn.close()
-    logger.info("Recipe database tables initialized")
+    The database is consulted at most every CATALOG_VERSION_TTL seconds.
+    """
+    if (_catalog['version'] is None
+            or time.monotonic() - _catalog['checked_at'] > CATALOG_VERSION_TTL):
+        return refresh_catalog()
+    return _catalog['version'], _catalog['updated_at']
+
+# Suggestion sort orders: name -> key(recipe_id, match_count, total_ingredients).
+# Keys only use what the ingredient index holds, so ranking never reads recipe rows.
+SUGGESTION_SORTS = {
+    # Highest match percentage first
+    'match': lambda recipe_id, matched, total: (-matched / total, recipe_id),
+    # Fewest missing ingredients first
+    'missing': lambda recipe_id, matched, total: (total - matched, -matched / total, recipe_id),
+}
+
+DEFAULT_SUGGESTION_LIMIT = 20
+
+# Scoring engines: 'python' ranks the per-user incremental match counts,
+# 'sparse' scores with sparse matrix products (needs numpy and scipy)
+SUGGESTION_ENGINES = ('python', 'sparse')
+DEFAULT_SUGGESTION_ENGINE = os.environ.get('FOOD_PLANNER_SUGGESTION_ENGINE', 'python')
+
+def _encode_suggestion_cursor(sort, recipe_id, matched, total):
+    return f"{sort}:{matched}:{total}:{recipe_id}"
 
-def get_recipe_suggestions(username, ingredient_match_threshold=0.5):
+def _decode_suggestion_cursor(cursor, sort):
+    try:
+        cursor_sort, matched, total, recipe_id = cursor.split(':')
+        matched, total, recipe_id = int(matched), int(total), int(recipe_id)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or total <= 0:
+        raise ValueError("Cursor does not belong to this sort order")
+    return SUGGESTION_SORTS[sort](recipe_id, matched, total)
+
+def _rank_python(match_counts, threshold, k, sort_key, after=None):
+    # Keep the best k recipes past the cursor that meet the threshold
+    def ranked():
+        for recipe_id, matched in match_counts.items():
+            total = len(recipe_index.recipe_ingredients(recipe_id))
+            if matched / total < threshold:
+                continue
+            key = sort_key(recipe_id, matched, total)
+            if after is None or key > after:
+                yield key, recipe_id, matched, total
+    
+    return [(recipe_id, matched, total) for _, recipe_id, matched, total in heapq.nsmallest(k, ranked())]
+
+def _load_recipe_summaries(cursor, recipe_ids):
+    """Recipe rows (as dicts) by id, read through recipe_summary_cache."""
+    recipes = {}
+    uncached = []
+    for recipe_id in recipe_ids:
+        recipe = recipe_summary_cache.get(recipe_id)
+        if recipe is MISSING:
+            uncached.append(recipe_id)
+        else:
+            recipes[recipe_id] = recipe
+    for start in range(0, len(uncached), SQL_BATCH_SIZE):
+        batch = uncached[start:start + SQL_BATCH_SIZE]
+        placeholders = ','.join(['?'] * len(batch))
+        cursor.execute(f"""
+            SELECT id, name, description, preparation_time, cooking_time,
+                   servings, difficulty, image_url
+            FROM recipes
+            WHERE id IN ({placeholders})
+        """, batch)
+        for row in cursor.fetchall():
+            recipe = dict(row)
+            recipe_summary_cache.set(recipe['id'], recipe)
+            recipes[recipe['id']] = recipe
+    return recipes
+
+def _format_suggestion(recipe, matched, total, user_ingredients):
+    recipe_ingredients = recipe_index.recipe_ingredients(recipe['id'])
+    return {
+        'id': recipe['id'],
+        'name': recipe['name'],
+        'description': recipe['description'],
+        'preparation_time': recipe['preparation_time'],
+        'cooking_time': recipe['cooking_time'],
+        'servings': recipe['servings'],
+        'difficulty': recipe['difficulty'],
+        'image_url': recipe['image_url'],
+        'match_percentage': matched / total,
+        'matching_ingredients': [name for ingredient_id, name in recipe_ingredients
+                                 if ingredient_id in user_ingredients],
+        'missing_ingredients': [name for ingredient_id, name in recipe_ingredients
+                                if ingredient_id not in user_ingredients]
+    }
+
+def _check_engine(engine):
+    if engine not in SUGGESTION_ENGINES:
+        raise ValueError(f"Unknown suggestion engine: {engine}")
+    if engine == 'sparse' and not sparse_engine.available():
+        raise ValueError("The sparse suggestion engine needs numpy and scipy installed")
+
+def get_recipe_suggestions(username, ingredient_match_threshold=0.5,
+                           limit=DEFAULT_SUGGESTION_LIMIT, cursor=None, sort='match',
+                           engine=None):
     """
     Get recipe suggestions based on user's ingredients.
     
+    With the default 'python' engine recipes are ranked with a bounded heap
+    over the user's cached match counts; the 'sparse' engine scores the
+    pantry as a sparse matrix-vector product. Either way full records are
+    only built for the returned page.
+    
     Args:
         username: The username to get ingredients for
         ingredient_match_threshold: Minimum percentage of recipe ingredients the user must have
+        limit: Maximum number of recipes to return
+        cursor: next_cursor from a previous page, or None for the first page
+        sort: One of SUGGESTION_SORTS
+        engine: One of SUGGESTION_ENGINES (None for DEFAULT_SUGGESTION_ENGINE)
         
     Returns:
-        List of recipe dictionaries with match percentage
+        Tuple of (list of recipe dictionaries with match percentage,
+        cursor for the next page or None)
     """
-    conn = sqlite3.connect('food_planner.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Get user's ingredients
-    cursor.execute(
-        "SELECT ingredient FROM ingredients WHERE username = ?", 
-        (username,)
-    )
-    user_ingredients = [row['ingredient'].lower() for row in cursor.fetchall()]
+    if sort not in SUGGESTION_SORTS:
+        raise ValueError(f"Unknown sort order: {sort}")
+    engine = engine or DEFAULT_SUGGESTION_ENGINE
+    _check_engine(engine)
+    sort_key = SUGGESTION_SORTS[sort]
+    after = _decode_suggestion_cursor(cursor, sort) if cursor else None
+    
+    catalog_version()
+    
+    conn = get_connection()
+    db_cursor = conn.cursor()
+    
+    recipe_index.ensure_built(conn)
+    if engine == 'sparse':
+        db_cursor.execute(
+            "SELECT DISTINCT ingredient_id FROM ingredients WHERE username = ?",
+            (username,)
+        )
+        user_ingredients = {row['ingredient_id'] for row in db_cursor.fetchall()}
+    else:
+        # The user's materialized suggestion state, which pantry writes keep
+        # current incrementally
+        user_ingredients, match_counts = suggestion_state.match_counts(conn, username)
     
     if not user_ingredients:
         conn.close()
-        return []
+        return [], None
+    
+    # Rank one extra recipe to tell whether there is a next page
+    if engine == 'sparse':
+        page = sparse_engine.rank(user_ingredients, ingredient_match_threshold, limit + 1, sort_key, after)
+    else:
+        if ingredient_match_threshold <= 0:
+            # Recipes without any matching ingredient still pass a zero threshold
+            for recipe_id in recipe_index.recipe_ids():
+                match_counts.setdefault(recipe_id, 0)
+        page = _rank_python(match_counts, ingredient_match_threshold, limit + 1, sort_key, after)
+    
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        recipe_id, matched, total = page[-1]
+        next_cursor = _encode_suggestion_cursor(sort, recipe_id, matched, total)
+    
+    recipes = _load_recipe_summaries(db_cursor, [recipe_id for recipe_id, _, _ in page])
+    conn.close()
     
-    # Get all recipes with their ingredients
-    cursor.execute("""
-        SELECT r.id, r.name, r.description, r.preparation_time, r.cooking_time, 
-               r.servings, r.difficulty, r.image_url, COUNT(ri.id) as total_ingredients
-        FROM recipes r
-        JOIN recipe_ingredients ri ON r.id = ri.recipe_id
-        GROUP BY r.id
-    """)
-    recipes = cursor.fetchall()
+    suggestions = [
+        _format_suggestion(recipes[recipe_id], matched, total, user_ingredients)
+        for recipe_id, matched, total in page
+    ]
+    return suggestions, next_cursor
+
+def get_batch_recipe_suggestions(usernames=None, ingredient_match_threshold=0.5,
+                                 limit=DEFAULT_SUGGESTION_LIMIT, sort='match', engine=None):
+    """
+    Get the first page of suggestions for many users at once.
     
-    suggestions = []
+    Meant for batch jobs such as suggestion digests: pantries are read in one
+    query and, with the 'sparse' engine, scored with one sparse matrix product.
     
-    for recipe in recipes:
-        # Get ingredients for this recipe
-        cursor.execute(
-            "SELECT ingredient FROM recipe_ingredients WHERE recipe_id = ?",
-            (recipe['id'],)
-        )
-        recipe_ingredients = [row['ingredient'].lower() for row in cursor.fetchall()]
-        
-        # Calculate match percentage
-        matching_ingredients = [i for i in recipe_ingredients if i in user_ingredients]
-        match_percentage = len(matching_ingredients) / len(recipe_ingredients)
+    Args:
+        usernames: Users to score (None for every user with a pantry)
+        ingredient_match_threshold: Minimum percentage of recipe ingredients the user must have
+        limit: Maximum number of recipes per user
+        sort: One of SUGGESTION_SORTS
+        engine: One of SUGGESTION_ENGINES (None for 'sparse' when installed)
         
-        # Only include recipes that meet the threshold
-        if match_percentage >= ingredient_match_threshold:
-            suggestions.append({
-                'id': recipe['id'],
-                'name': recipe['name'],
-                'description': recipe['description'],
-                'preparation_time': recipe['preparation_time'],
-                'cooking_time': recipe['cooking_time'],
-                'servings': recipe['servings'],
-                'difficulty': recipe['difficulty'],
-                'image_url': recipe['image_url'],
-                'match_percentage': match_percentage,
-                'matching_ingredients': matching_ingredients,
-                'missing_ingredients': [i for i in recipe_ingredients if i not in user_ingredients]
-            })
-    
-    # Sort by match percentage (highest first)
-    suggestions.sort(key=lambda x: x['match_percentage'], reverse=True)
+    Returns:
+        Dict of username -> list of recipe dictionaries with match percentage;
+        users with an empty pantry get an empty list
+    """
+    if sort not in SUGGESTION_SORTS:
+        raise ValueError(f"Unknown sort order: {sort}")
+    engine = engine or ('sparse' if sparse_engine.available() else 'python')
+    _check_engine(engine)
+    sort_key = SUGGESTION_SORTS[sort]
+    
+    catalog_version()
     
+    conn = get_connection()
+    cursor = conn.cursor()
+    recipe_index.ensure_built(conn)
+    
+    pantries = {}
+    if usernames is None:
+        cursor.execute("SELECT DISTINCT username, ingredient_id FROM ingredients")
+        for row in cursor.fetchall():
+            pantries.setdefault(row['username'], set()).add(row['ingredient_id'])
+    else:
+        usernames = list(dict.fromkeys(usernames))
+        for username in usernames:
+            pantries[username] = set()
+        for start in range(0, len(usernames), SQL_BATCH_SIZE):
+            batch = usernames[start:start + SQL_BATCH_SIZE]
+            placeholders = ','.join(['?'] * len(batch))
+            cursor.execute(
+                f"SELECT DISTINCT username, ingredient_id FROM ingredients WHERE username IN ({placeholders})",
+                batch
+            )
+            for row in cursor.fetchall():
+                pantries[row['username']].add(row['ingredient_id'])
+    
+    names = list(pantries)
+    if engine == 'sparse':
+        pages = sparse_engine.rank_many([pantries[name] for name in names],
+                                        ingredient_match_threshold, limit, sort_key)
+    else:
+        pages = []
+        for name in names:
+            match_counts = recipe_index.count_matches(pantries[name])
+            if ingredient_match_threshold <= 0:
+                for recipe_id in recipe_index.recipe_ids():
+                    match_counts.setdefault(recipe_id, 0)
+            pages.append(_rank_python(match_counts, ingredient_match_threshold, limit, sort_key))
+    
+    recipes = _load_recipe_summaries(
+        cursor, list({recipe_id for page in pages for recipe_id, _, _ in page})
+    )
     conn.close()
+    
+    suggestions = {}
+    for name, page in zip(names, pages):
+        if not pantries[name]:
+            suggestions[name] = []
+            continue
+        suggestions[name] = [
+            _format_suggestion(recipes[recipe_id], matched, total, pantries[name])
+            for recipe_id, matched, total in page
+        ]
     return suggestions
 
+def find_recipes_by_ingredients(ingredients, limit=5, offset=0):
+    """
+    Rank recipes by how many of the given ingredients they use.
+    
+    Only recipes containing at least one of the ingredients are visited: they
+    are found through the (ingredient_id, recipe_id) index and aggregated,
+    instead of grouping the whole catalog.
+    
+    Args:
+        ingredients: Ingredient names as entered by the user
+        limit: Maximum number of recipes to return
+        offset: Number of ranked recipes to skip
+        
+    Returns:
+        List of recipe dictionaries with matching/missing ingredients and
+        match percentage, most matches first
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    # Match on dictionary ids so case, plurals and synonyms line up
+    ingredient_ids = list(set(resolve_ingredient_ids(cursor, ingredients, create=False).values()))
+    if not ingredient_ids:
+        conn.close()
+        return []
+    
+    placeholders = ','.join(['?'] * len(ingredient_ids))
+    cursor.execute(f"""
+        WITH matches AS (
+            SELECT recipe_id, COUNT(*) AS match_count
+            FROM recipe_ingredients
+            WHERE ingredient_id IN ({placeholders})
+            GROUP BY recipe_id
+        )
+        SELECT r.id, r.name, r.description, r.instructions, m.match_count,
+               (SELECT COUNT(*) FROM recipe_ingredients ri
+                WHERE ri.recipe_id = m.recipe_id) AS total_ingredients
+        FROM matches m
+        JOIN recipes r ON r.id = m.recipe_id
+        ORDER BY m.match_count DESC, total_ingredients ASC, r.id
+        LIMIT ? OFFSET ?
+    """, ingredient_ids + [limit, offset])
+    recipes = cursor.fetchall()
+    
+    # Ingredients for the returned page only
+    recipe_ingredients = {}
+    if recipes:
+        page_placeholders = ','.join(['?'] * len(recipes))
+        cursor.execute(f"""
+            SELECT recipe_id, ingredient, ingredient_id
+            FROM recipe_ingredients
+            WHERE recipe_id IN ({page_placeholders})
+            ORDER BY recipe_id, id
+        """, [recipe['id'] for recipe in recipes])
+        for row in cursor.fetchall():
+            recipe_ingredients.setdefault(row['recipe_id'], []).append(row)
+    
+    conn.close()
+    
+    matched = set(ingredient_ids)
+    formatted_recipes = []
+    for recipe in recipes:
+        rows = recipe_ingredients.get(recipe['id'], [])
+        formatted_recipes.append({
+            'id': recipe['id'],
+            'name': recipe['name'],
+            'description': recipe['description'],
+            'matching_ingredients': [row['ingredient'] for row in rows if row['ingredient_id'] in matched],
+            'missing_ingredients': [row['ingredient'] for row in rows if row['ingredient_id'] not in matched],
+            'match_percentage': round(recipe['match_count'] / recipe['total_ingredients'], 2),
+            'instructions': recipe['instructions'].split('\n') if recipe['instructions'] else []
+        })
+    
+    return formatted_recipes
+
 def get_recipe_by_id(recipe_id):
-    """Get detailed information about a specific recipe."""
-    conn = sqlite3.connect('food_planner.db')
-    conn.row_factory = sqlite3.Row
+    """
+    Get detailed information about a specific recipe.
+    
+    Results are cached until the catalog version changes; the returned
+    dictionary is shared and must not be modified.
+    """
+    catalog_version()
+    recipe_dict = recipe_cache.get(recipe_id)
+    if recipe_dict is not MISSING:
+        return recipe_dict
+    
+    conn = get_connection()
     cursor = conn.cursor()
     
     # Get recipe details
@@ -139,6 +517,7 @@ def get_recipe_by_id(recipe_id):
     
     if not recipe:
         conn.close()
+        recipe_cache.set(recipe_id, None)
         return None
     
     # Get recipe ingredients
@@ -152,39 +531,209 @@ def get_recipe_by_id(recipe_id):
     recipe_dict['ingredients'] = ingredients
     
     conn.close()
+    recipe_cache.set(recipe_id, recipe_dict)
     return recipe_dict
 
-def search_recipes(query):
-    """Search for recipes by name or description."""
-    conn = sqlite3.connect('food_planner.db')
-    conn.row_factory = sqlite3.Row
+# Fields a client may ask for with ?fields= on batch recipe fetches
+RECIPE_FIELDS = (
+    'id', 'external_id', 'name', 'description', 'preparation_time', 'cooking_time',
+    'servings', 'difficulty', 'image_url', 'instructions', 'created_at', 'ingredients'
+)
+
+def get_recipes_by_ids(recipe_ids, fields=RECIPE_FIELDS):
+    """
+    Get many recipes at once, in the shape get_recipe_by_id() returns.
+    
+    Cached recipes are reused; the rest are loaded with one query per table
+    (per SQL_BATCH_SIZE ids) and grouped in memory.
+    
+    Args:
+        recipe_ids: Recipe ids, in the order to return them
+        fields: Fields to include in each recipe (see RECIPE_FIELDS)
+        
+    Returns:
+        Tuple of (list of recipe dictionaries, list of ids that do not exist)
+    """
+    catalog_version()
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    with_ingredients = 'ingredients' in fields
+    
+    recipes = {}
+    uncached = []
+    for recipe_id in recipe_ids:
+        recipe = recipe_cache.get(recipe_id)
+        if recipe is MISSING:
+            uncached.append(recipe_id)
+        else:
+            recipes[recipe_id] = recipe
+    
+    if uncached:
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            for start in range(0, len(uncached), SQL_BATCH_SIZE):
+                batch = uncached[start:start + SQL_BATCH_SIZE]
+                placeholders = ','.join(['?'] * len(batch))
+                cursor.execute(f"SELECT * FROM recipes WHERE id IN ({placeholders})", batch)
+                loaded = {row['id']: dict(row) for row in cursor.fetchall()}
+                
+                if with_ingredients:
+                    for recipe in loaded.values():
+                        recipe['ingredients'] = []
+                    cursor.execute(f"""
+                        SELECT recipe_id, ingredient, quantity, unit
+                        FROM recipe_ingredients
+                        WHERE recipe_id IN ({placeholders})
+                        ORDER BY recipe_id, id
+                    """, batch)
+                    for row in cursor.fetchall():
+                        loaded[row['recipe_id']]['ingredients'].append(
+                            {'ingredient': row['ingredient'], 'quantity': row['quantity'], 'unit': row['unit']}
+                        )
+                
+                for recipe_id in batch:
+                    recipe = loaded.get(recipe_id)
+                    # Rows without their ingredients are not complete enough to cache
+                    if with_ingredients or recipe is None:
+                        recipe_cache.set(recipe_id, recipe)
+                    recipes[recipe_id] = recipe
+        finally:
+            conn.close()
+    
+    found = []
+    missing = []
+    for recipe_id in recipe_ids:
+        recipe = recipes[recipe_id]
+        if recipe is None:
+            missing.append(recipe_id)
+        else:
+            found.append({field: recipe[field] for field in fields})
+    return found, missing
+
+def search_recipes(query, limit=20, offset=0):
+    """
+    Full-text search over recipe names, descriptions, instructions and ingredients.
+    
+    Every word in the query is matched as a prefix ("chick sou" finds
+    "Chicken Soup"); results are ranked by bm25 with name matches weighted
+    highest and carry a highlighted snippet.
+    
+    Args:
+        query: Free text search query
+        limit: Maximum number of recipes to return
+        offset: Number of ranked recipes to skip
+        
+    Returns:
+        List of recipe dictionaries, best match first (shared with the cache;
+        do not modify)
+    """
+    catalog_version()
+    key = (query, limit, offset)
+    recipes = search_cache.get(key)
+    if recipes is not MISSING:
+        return recipes
+    
+    recipes = _search_recipes(query, limit, offset)
+    search_cache.set(key, recipes)
+    return recipes
+
+def _search_recipes(query, limit, offset):
+    conn = get_connection()
     cursor = conn.cursor()
     
-    search_term = f"%{query}%"
+    if not search_index_available(conn):
+        # SQLite without FTS5: fall back to substring matching
+        search_term = f"%{query}%"
+        cursor.execute("""
+            SELECT r.id, r.name, r.description, r.preparation_time, r.cooking_time, 
+                   r.servings, r.difficulty, r.image_url, NULL AS snippet
+            FROM recipes r
+            WHERE r.name LIKE ? OR r.description LIKE ?
+            ORDER BY r.id
+            LIMIT ? OFFSET ?
+        """, (search_term, search_term, limit, offset))
+        recipes = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return recipes
     
-    cursor.execute("""
+    match = ' '.join(f'"{token}"*' for token in SEARCH_TOKEN.findall(query))
+    if not match:
+        conn.close()
+        return []
+    
+    cursor.execute(f"""
         SELECT r.id, r.name, r.description, r.preparation_time, r.cooking_time, 
-               r.servings, r.difficulty, r.image_url
-        FROM recipes r
-        WHERE r.name LIKE ? OR r.description LIKE ?
-    """, (search_term, search_term))
+               r.servings, r.difficulty, r.image_url,
+               snippet(recipes_fts, -1, '<mark>', '</mark>', '...', 12) AS snippet
+        FROM recipes_fts
+        JOIN recipes r ON r.id = recipes_fts.rowid
+        WHERE recipes_fts MATCH ?
+        ORDER BY bm25(recipes_fts, {SEARCH_COLUMN_WEIGHTS})
+        LIMIT ? OFFSET ?
+    """, (match, limit, offset))
     
     recipes = [dict(row) for row in cursor.fetchall()]
     
     conn.close()
     return recipes
 
+def get_favorite_ids(username):
+    """Ids of a user's favorite recipes as a frozenset (cached per user)."""
+    favorite_ids = favorite_ids_cache.get(username)
+    if favorite_ids is not MISSING:
+        return favorite_ids
+    
+    # Loading under the lock keeps a concurrent add/remove from being
+    # overwritten by an older read
+    with _favorites_lock:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT recipe_id FROM user_favorite_recipes WHERE username = ?",
+            (username,)
+        )
+        favorite_ids = frozenset(row['recipe_id'] for row in cursor.fetchall())
+        conn.close()
+        favorite_ids_cache.set(username, favorite_ids)
+    return favorite_ids
+
+def get_favorite_statuses(username, recipe_ids):
+    """
+    Check which of several recipes a user has favorited.
+    
+    Args:
+        username: The user to check
+        recipe_ids: Iterable of recipe ids
+        
+    Returns:
+        Dict of recipe_id -> bool
+    """
+    favorite_ids = get_favorite_ids(username)
+    return {recipe_id: recipe_id in favorite_ids for recipe_id in recipe_ids}
+
+def _update_favorite_ids(username, recipe_id, favorite):
+    with _favorites_lock:
+        favorite_ids = favorite_ids_cache.get(username)
+        if favorite_ids is MISSING:
+            return
+        if favorite:
+            favorite_ids_cache.set(username, favorite_ids | {recipe_id})
+        else:
+            favorite_ids_cache.set(username, favorite_ids - {recipe_id})
+
 def add_favorite_recipe(username, recipe_id):
     """Add a recipe to user's favorites."""
-    conn = sqlite3.connect('food_planner.db')
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
+        # Favoriting twice is a no-op thanks to the unique (username, recipe_id) index
         cursor.execute(
-            "INSERT INTO user_favorite_recipes (username, recipe_id) VALUES (?, ?)",
+            "INSERT OR IGNORE INTO user_favorite_recipes (username, recipe_id) VALUES (?, ?)",
             (username, recipe_id)
         )
         conn.commit()
+        _update_favorite_ids(username, recipe_id, True)
         success = True
     except sqlite3.Error as e:
         logger.error(f"Error adding favorite recipe: {e}")
@@ -193,28 +742,69 @@ def add_favorite_recipe(username, recipe_id):
     conn.close()
     return success
 
-def get_favorite_recipes(username):
-    """Get a user's favorite recipes."""
-    conn = sqlite3.connect('food_planner.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+# Recipe columns a client may ask for with ?fields= on favorite listings
+FAVORITE_FIELDS = (
+    'id', 'name', 'description', 'preparation_time', 'cooking_time',
+    'servings', 'difficulty', 'image_url'
+)
+
+def get_favorite_recipes(username, after_id=None, limit=None, fields=FAVORITE_FIELDS):
+    """
+    Get a user's favorite recipes ordered by recipe id.
     
-    cursor.execute("""
-        SELECT r.id, r.name, r.description, r.preparation_time, r.cooking_time, 
-               r.servings, r.difficulty, r.image_url
-        FROM recipes r
-        JOIN user_favorite_recipes ufr ON r.id = ufr.recipe_id
+    Pages are read in (username, recipe_id) index order, so each page costs
+    the same no matter how many favorites come before it.
+    
+    Args:
+        username: The user whose favorites to list
+        after_id: next_after_id from the previous page, or None for the first
+        limit: Page size (None for everything after ``after_id``)
+        fields: Subset of FAVORITE_FIELDS to return
+        
+    Returns:
+        Tuple of (list of recipe dictionaries, after_id of the next page or None)
+        
+    Raises:
+        ValueError: If ``fields`` names an unknown field
+    """
+    unknown = set(fields) - set(FAVORITE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown recipe fields: {', '.join(sorted(unknown))}")
+    
+    columns = ', '.join(f"r.{field}" for field in fields)
+    query = f"""
+        SELECT ufr.recipe_id AS _cursor, {columns}
+        FROM user_favorite_recipes ufr
+        JOIN recipes r ON r.id = ufr.recipe_id
         WHERE ufr.username = ?
-    """, (username,))
+    """
+    params = [username]
+    if after_id is not None:
+        query += " AND ufr.recipe_id > ?"
+        params.append(after_id)
+    query += " ORDER BY ufr.recipe_id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit + 1)
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    conn.close()
     
-    recipes = [dict(row) for row in cursor.fetchall()]
+    next_after_id = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_after_id = rows[-1][0]
     
-    conn.close()
-    return recipes
+    recipes = [dict(zip(fields, row[1:])) for row in rows]
+    return recipes, next_after_id
 
 def remove_favorite_recipe(username, recipe_id):
     """Remove a recipe from user's favorites."""
-    conn = sqlite3.connect('food_planner.db')
+    conn = get_connection()
     cursor = conn.cursor()
     
     try:
@@ -223,6 +813,7 @@ def remove_favorite_recipe(username, recipe_id):
             (username, recipe_id)
         )
         conn.commit()
+        _update_favorite_ids(username, recipe_id, False)
         success = True
     except sqlite3.Error as e:
         logger.error(f"Error removing favorite recipe: {e}")
@@ -232,50 +823,10 @@ def remove_favorite_recipe(username, recipe_id):
     return success
 
 def init_recipe_db():
-    """Initialize the recipe database tables if they don't exist."""
-    conn = sqlite3.connect('food_planner.db')
+    """Seed sample recipes into an empty catalog and build the ingredient index."""
+    conn = get_connection()
     cursor = conn.cursor()
     
-    # Create recipes table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS recipes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        description TEXT,
-        preparation_time INTEGER,
-        cooking_time INTEGER,
-        servings INTEGER,
-        difficulty TEXT,
-        image_url TEXT,
-        instructions TEXT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Create recipe_ingredients table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS recipe_ingredients (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        recipe_id INTEGER NOT NULL,
-        ingredient TEXT NOT NULL,
-        quantity TEXT,
-        unit TEXT,
-        FOREIGN KEY (recipe_id) REFERENCES recipes (id)
-    )
-    ''')
-    
-    # Create user_favorite_recipes table
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS user_favorite_recipes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT NOT NULL,
-        recipe_id INTEGER NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (username) REFERENCES users (username),
-        FOREIGN KEY (recipe_id) REFERENCES recipes (id)
-    )
-    ''')
-
     # Check if sample recipes exist
     cursor.execute("SELECT COUNT(*) FROM recipes")
     if cursor.fetchone()[0] == 0:
@@ -302,12 +853,18 @@ def init_recipe_db():
             ''', (recipe['name'], recipe['description'], recipe['instructions']))
             recipe_id = cursor.lastrowid
             
+            ingredient_ids = resolve_ingredient_ids(cursor, recipe['ingredients'])
             for ingredient in recipe['ingredients']:
                 cursor.execute('''
-                    INSERT INTO recipe_ingredients (recipe_id, ingredient)
-                    VALUES (?, ?)
-                ''', (recipe_id, ingredient))
+                    INSERT INTO recipe_ingredients (recipe_id, ingredient, ingredient_id)
+                    VALUES (?, ?, ?)
+                ''', (recipe_id, ingredient, ingredient_ids[ingredient]))
+        
+        bump_catalog_version(cursor)
     
     conn.commit()
+    
+    # Build the in-memory ingredient index once the catalog is in place
+    refresh_catalog(conn)
     conn.close()
-    logger.info("Recipe database tables initialized")
\ No newline at end of file
+    logger.info("Recipe database initialized")
\ No newline at end of file
@@ -0,0 +1,171 @@
+# responses.py
+#
+# Response encoding: a faster JSON provider for Flask, gzip/brotli
+# compression of large responses, and the compact recipe-list format.
+#
+# orjson and brotli are optional dependencies. Without orjson the standard
+# library encoder is used; without brotli only gzip is offered.
+import gzip
+import json
+import logging
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.environ.get('FOOD_PLANNER_COMPRESSION_MIN_BYTES', '1024'))
+
+# Fast settings; responses are compressed on every request, not cached
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain')
+
+# Recipe list formats accepted by the chat and suggestion endpoints
+RESPONSE_FORMATS = ('full', 'compact')
+
+# Recipe fields holding ingredient names; the compact format sends indexes instead
+INGREDIENT_LIST_FIELDS = ('matching_ingredients', 'missing_ingredients')
+
+if orjson is not None:
+    # Dates and dataclasses go through Flask's default() so the output
+    # matches the standard provider
+    ORJSON_OPTIONS = (
+        orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that encodes with orjson when it is installed.
+
+    Output is compact and key-sorted like the default provider's; in debug
+    mode (pretty-printed output) the default provider is used.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS).decode()
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._app.debug:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def dumps(obj):
+    """Encode ``obj`` as compact, key-sorted JSON bytes (for non-Flask callers)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def choose_encoding(accept_encodings):
+    """
+    Pick a content encoding.
+
+    Args:
+        accept_encodings: Parsed Accept-Encoding header (werkzeug Accept)
+
+    Returns:
+        'br', 'gzip' or None
+    """
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+def compress_response(response, accept_encodings):
+    """
+    Compress a Flask response in place if it is large enough and the client
+    accepts gzip or brotli.
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return response
+
+    # Caches must keep the encodings apart even when this client gets identity
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # A strong ETag promises byte-identical bodies across encodings
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+def parse_format(value):
+    """
+    Validate a requested recipe list format.
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if value is None:
+        return 'full'
+    if value not in RESPONSE_FORMATS:
+        raise ValueError(f"Unknown format: {value}. Use one of: {', '.join(RESPONSE_FORMATS)}")
+    return value
+
+def compact_recipes(recipes):
+    """
+    Convert recipes to the compact format: every ingredient name is listed
+    once in a lookup table and the matching/missing lists hold indexes into
+    it.
+
+    Returns:
+        Tuple of (ingredient names, recipes with index lists)
+    """
+    names = []
+    positions = {}
+    compacted = []
+    for recipe in recipes:
+        recipe = dict(recipe)
+        for field in INGREDIENT_LIST_FIELDS:
+            if field in recipe:
+                indexes = []
+                for name in recipe[field]:
+                    position = positions.get(name)
+                    if position is None:
+                        position = positions[name] = len(names)
+                        names.append(name)
+                    indexes.append(position)
+                recipe[field] = indexes
+        compacted.append(recipe)
+    return names, compacted
+
+def recipe_list_payload(recipes, response_format, **extra):
+    """Response body for a recipe list in the requested format."""
+    if response_format == 'compact':
+        ingredients, recipes = compact_recipes(recipes)
+        return {"ingredients": ingredients, "recipes": recipes, **extra}
+    return {"recipes": recipes, **extra}
@@ -0,0 +1,169 @@
+# sparse_engine.py
+#
+# Vectorized suggestion scoring. The recipe/ingredient incidence from
+# recipe_index is held as a CSR matrix (recipes x ingredients, values are
+# occurrence counts), so scoring one pantry is a sparse matrix-vector product
+# and scoring a batch of pantries is one sparse matrix product. Thresholding,
+# cursor filtering and top-k selection run on numpy arrays.
+#
+# numpy and scipy are optional dependencies; available() reports whether
+# this engine can be used.
+import threading
+import logging
+
+import recipe_index
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_generation = None
+_matrix = None
+_recipe_ids = None
+_totals = None
+_columns = {}
+
+def available():
+    """Whether numpy and scipy are installed."""
+    return np is not None
+
+def _build_locked():
+    global _generation, _matrix, _recipe_ids, _totals, _columns
+
+    generation, recipe_ingredients = recipe_index.snapshot()
+    recipe_ids = sorted(recipe_ingredients)
+    columns = {}
+    rows, cols = [], []
+    for row, recipe_id in enumerate(recipe_ids):
+        for ingredient_id, _ in recipe_ingredients[recipe_id]:
+            rows.append(row)
+            cols.append(columns.setdefault(ingredient_id, len(columns)))
+
+    # Duplicate (row, col) pairs are summed, giving occurrence counts
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(recipe_ids), len(columns))
+    )
+    matrix.sum_duplicates()
+
+    _matrix = matrix
+    _recipe_ids = np.array(recipe_ids, dtype=np.int64)
+    _totals = np.array([len(recipe_ingredients[recipe_id]) for recipe_id in recipe_ids], dtype=np.int64)
+    _columns = columns
+    _generation = generation
+    logger.info(f"Sparse suggestion matrix built: {matrix.shape[0]} recipes x "
+                f"{matrix.shape[1]} ingredients, {matrix.nnz} entries")
+
+def _current():
+    # Rebuild whenever recipe_index has changed since the last build
+    with _lock:
+        if _generation != recipe_index.generation():
+            _build_locked()
+        return _matrix, _recipe_ids, _totals, _columns
+
+def _pantry_matrix(pantries, columns):
+    """Ingredients x pantries 0/1 matrix; ingredients no recipe uses are dropped."""
+    rows, cols = [], []
+    for col, pantry in enumerate(pantries):
+        for ingredient_id in pantry:
+            row = columns.get(ingredient_id)
+            if row is not None:
+                rows.append(row)
+                cols.append(col)
+    return sparse.csc_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(columns), len(pantries))
+    )
+
+def _top_k(positions, matched, recipe_ids, totals, threshold, k, sort_key, after):
+    """
+    Best ``k`` candidates as (recipe_id, matched, total) tuples.
+
+    Args:
+        positions: Matrix rows of the candidate recipes
+        matched: Match counts of the candidates
+        sort_key: Key function from recipes_db.SUGGESTION_SORTS; it is
+            applied to whole arrays, giving one array per key component
+        after: Key of the last recipe of the previous page, or None
+    """
+    totals = totals[positions]
+    recipe_ids = recipe_ids[positions]
+
+    keep = matched / totals >= threshold
+    matched, totals, recipe_ids = matched[keep], totals[keep], recipe_ids[keep]
+    keys = sort_key(recipe_ids, matched, totals)
+
+    if after is not None:
+        # Vectorized lexicographic comparison: key > after
+        greater = keys[-1] > after[-1]
+        for column, value in zip(keys[-2::-1], after[-2::-1]):
+            greater = (column > value) | ((column == value) & greater)
+        keys = tuple(column[greater] for column in keys)
+        matched, totals, recipe_ids = matched[greater], totals[greater], recipe_ids[greater]
+
+    if len(recipe_ids) > k:
+        # Narrow down to everything tied with or better than the k-th
+        # primary key before the full lexicographic sort
+        primary = keys[0]
+        kth = np.partition(primary, k - 1)[k - 1]
+        narrowed = primary <= kth
+        keys = tuple(column[narrowed] for column in keys)
+        matched, totals, recipe_ids = matched[narrowed], totals[narrowed], recipe_ids[narrowed]
+
+    # np.lexsort sorts by its last key first
+    order = np.lexsort(keys[::-1])[:k]
+    return list(zip(recipe_ids[order].tolist(), matched[order].tolist(), totals[order].tolist()))
+
+def rank(pantry, threshold, k, sort_key, after=None):
+    """
+    Rank recipes for one pantry.
+
+    Args:
+        pantry: Set of ingredient_dictionary ids
+        threshold: Minimum fraction of a recipe's ingredients that must match
+        k: Number of recipes to return
+        sort_key: Key function from recipes_db.SUGGESTION_SORTS
+        after: Only return recipes whose key is greater than this
+
+    Returns:
+        List of (recipe_id, matched, total) tuples, best first
+    """
+    matrix, recipe_ids, totals, columns = _current()
+    vector = np.zeros(len(columns), dtype=np.int32)
+    vector[[columns[i] for i in pantry if i in columns]] = 1
+    matched = matrix @ vector
+
+    if threshold <= 0:
+        positions = np.arange(len(recipe_ids))
+    else:
+        positions = np.flatnonzero(matched)
+    return _top_k(positions, matched[positions], recipe_ids, totals, threshold, k, sort_key, after)
+
+def rank_many(pantries, threshold, k, sort_key):
+    """
+    Rank recipes for many pantries with one sparse matrix product.
+
+    Returns:
+        One list of (recipe_id, matched, total) tuples per pantry, in order
+    """
+    matrix, recipe_ids, totals, columns = _current()
+    # recipes x pantries match counts, column-sliced per pantry
+    matches = (matrix @ _pantry_matrix(pantries, columns)).tocsc()
+
+    results = []
+    for col in range(len(pantries)):
+        start, end = matches.indptr[col], matches.indptr[col + 1]
+        positions = matches.indices[start:end]
+        matched = matches.data[start:end]
+        if threshold <= 0:
+            dense = np.zeros(len(recipe_ids), dtype=matched.dtype)
+            dense[positions] = matched
+            positions, matched = np.arange(len(recipe_ids)), dense
+        results.append(_top_k(positions, matched, recipe_ids, totals, threshold, k, sort_key, None))
+    return results
@@ -0,0 +1,50 @@
+# suggestion_digest.py
+#
+# Nightly "what can I cook" digests: scores every user's pantry in one batch
+# and writes one JSON line per user.
+#
+#   python suggestion_digest.py [--threshold 0.5] [--limit 10] [--output digest.jsonl]
+#
+# Uses the sparse engine when numpy and scipy are installed.
+import argparse
+import json
+import logging
+import sys
+import time
+
+from migration import migrate_database
+from recipes_db import SUGGESTION_ENGINES, SUGGESTION_SORTS, get_batch_recipe_suggestions
+
+logger = logging.getLogger(__name__)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write recipe suggestion digests for every user")
+    parser.add_argument('--threshold', type=float, default=0.5,
+                        help="Minimum fraction of a recipe's ingredients the user must have")
+    parser.add_argument('--limit', type=int, default=10, help="Recipes per user")
+    parser.add_argument('--sort', choices=sorted(SUGGESTION_SORTS), default='match')
+    parser.add_argument('--engine', choices=SUGGESTION_ENGINES,
+                        help="Scoring engine (default: sparse when installed)")
+    parser.add_argument('--user', action='append', dest='usernames',
+                        help="Only score this user (repeatable)")
+    parser.add_argument('--output', default='-', help="Output file, or - for stdout")
+    args = parser.parse_args(argv)
+
+    migrate_database()
+
+    started = time.perf_counter()
+    digests = get_batch_recipe_suggestions(args.usernames, args.threshold, args.limit, args.sort, args.engine)
+    elapsed = time.perf_counter() - started
+    logger.info(f"Scored {len(digests)} users in {elapsed:.2f}s")
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        for username, recipes in digests.items():
+            output.write(json.dumps({"username": username, "recipes": recipes}) + '\n')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
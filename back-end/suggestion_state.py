@@ -0,0 +1,160 @@
+import os
+import threading
+import logging
+
+import recipe_index
+from cache import MISSING, LRUCache
+from db import SQL_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Materialized per-user suggestion state: the user's pantry items, the set
+# of ingredient ids they resolve to, and the match count of every recipe
+# sharing at least one of them.
+#
+# Syncing is driven by the pantry change log (pantry_versions and
+# pantry_changes, see ingredients_db.py): the state remembers the pantry
+# version it reflects, and only the items changed since then are read, so a
+# pantry edit costs one version lookup plus the changed rows, and only the
+# recipes containing the added or removed ingredients are touched. The log
+# is shared by every process, so edits made elsewhere are picked up too.
+# State whose version was compacted away, or built against an older recipe
+# index, is rebuilt.
+SUGGESTION_STATE_USERS = int(os.environ.get('FOOD_PLANNER_SUGGESTION_STATE_USERS', '1024'))
+
+_states = LRUCache('suggestion_state', SUGGESTION_STATE_USERS)
+_lock = threading.Lock()
+
+def _read_pantry(conn, username, state):
+    """
+    Read what changed in a user's pantry since ``state`` was synced.
+
+    Returns:
+        Tuple of (current version, dict of item id -> ingredient id for the
+        whole pantry if a full read was needed, else None, dict of item id ->
+        ingredient id or None (deleted) for the changed items)
+    """
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        # One read snapshot, so the items match the version
+        conn.execute("BEGIN")
+    try:
+        row = conn.execute(
+            "SELECT version, min_version FROM pantry_versions WHERE username = ?", (username,)
+        ).fetchone()
+        version, min_version = (row[0], row[1]) if row else (0, 0)
+
+        if state is MISSING or not min_version <= state['version'] <= version:
+            cursor = conn.execute("SELECT id, ingredient_id FROM ingredients WHERE username = ?", (username,))
+            return version, {row[0]: row[1] for row in cursor.fetchall()}, None
+        if state['version'] == version:
+            return version, None, {}
+
+        cursor = conn.execute(
+            "SELECT DISTINCT item_id FROM pantry_changes WHERE username = ? AND version > ?",
+            (username, state['version'])
+        )
+        item_ids = [row[0] for row in cursor.fetchall()]
+        changed = dict.fromkeys(item_ids)
+        for start in range(0, len(item_ids), SQL_BATCH_SIZE):
+            batch = item_ids[start:start + SQL_BATCH_SIZE]
+            placeholders = ','.join(['?'] * len(batch))
+            cursor = conn.execute(
+                f"SELECT id, ingredient_id FROM ingredients WHERE username = ? AND id IN ({placeholders})",
+                [username] + batch
+            )
+            changed.update((row[0], row[1]) for row in cursor.fetchall())
+        return version, None, changed
+    finally:
+        if own_transaction:
+            conn.rollback()
+
+def _apply_changes(state, changed):
+    # rows: ingredient id -> number of pantry items resolving to it ("egg"
+    # and "eggs" both count); touched: ingredient id -> that number before
+    rows = state['rows']
+    touched = {}
+    for item_id, ingredient_id in changed.items():
+        old = state['items'].pop(item_id, None)
+        if ingredient_id is not None:
+            state['items'][item_id] = ingredient_id
+        if old == ingredient_id:
+            continue
+        for value, delta in ((old, -1), (ingredient_id, 1)):
+            if value is not None:
+                touched.setdefault(value, rows.get(value, 0))
+                rows[value] = rows.get(value, 0) + delta
+
+    added = set()
+    removed = set()
+    for ingredient_id, before in touched.items():
+        if rows[ingredient_id] <= 0:
+            del rows[ingredient_id]
+            if before > 0:
+                removed.add(ingredient_id)
+        elif before <= 0:
+            added.add(ingredient_id)
+    if not added and not removed:
+        return
+
+    state['pantry'] = frozenset(rows)
+    counts = state['counts']
+    for recipe_id, occurrences in recipe_index.count_matches(added).items():
+        counts[recipe_id] = counts.get(recipe_id, 0) + occurrences
+    for recipe_id, occurrences in recipe_index.count_matches(removed).items():
+        remaining = counts.get(recipe_id, 0) - occurrences
+        if remaining > 0:
+            counts[recipe_id] = remaining
+        else:
+            counts.pop(recipe_id, None)
+
+def _sync_locked(conn, username):
+    # Read the generation before counting: if the index changes in between,
+    # the state is stamped with the old generation and recounted next time
+    generation = recipe_index.generation()
+    state = _states.get(username)
+    version, items, changed = _read_pantry(conn, username, state)
+
+    if items is not None:
+        rows = {}
+        for ingredient_id in items.values():
+            if ingredient_id is not None:
+                rows[ingredient_id] = rows.get(ingredient_id, 0) + 1
+        state = {'items': items, 'rows': rows, 'pantry': frozenset(rows)}
+        state['counts'] = recipe_index.count_matches(state['pantry'])
+        state['generation'] = generation
+        _states.set(username, state)
+    elif state['generation'] != generation:
+        _apply_changes(state, changed)
+        state['counts'] = recipe_index.count_matches(state['pantry'])
+        state['generation'] = generation
+    else:
+        _apply_changes(state, changed)
+
+    state['version'] = version
+    return state
+
+def match_counts(conn, username):
+    """
+    Bring a user's state up to date with their pantry and return it.
+
+    Pantry edits made by other processes are picked up here as well, through
+    the shared pantry change log.
+
+    Returns:
+        Tuple of (frozenset of pantry ingredient ids,
+        dict of recipe_id -> number of matching recipe ingredients)
+    """
+    with _lock:
+        state = _sync_locked(conn, username)
+        return state['pantry'], dict(state['counts'])
+
+def pantry_changed(conn, username):
+    """
+    Apply a committed pantry write to the user's state, if it is materialized.
+
+    Checked/unchecked toggles do not affect matching and need no call.
+    """
+    with _lock:
+        if _states.get(username) is not MISSING:
+            _sync_locked(conn, username)
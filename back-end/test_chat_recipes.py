@@ -0,0 +1,158 @@
+# test_chat_recipes.py
+#
+# find_recipes_by_ingredients() (the chat recipe search) against the query it
+# replaced, which grouped the whole catalog:
+#
+#   ... FROM recipes r JOIN recipe_ingredients ri ON r.id = ri.recipe_id
+#   GROUP BY r.id HAVING match_count > 0
+#   ORDER BY match_count DESC, total_ingredients ASC
+#
+# Intentional differences, checked below rather than skipped:
+#   - Ties on (match_count, total_ingredients) are now broken by recipe id;
+#     the old order among them was whatever SQLite produced, so the old
+#     query is compared with r.id appended, plus once without it as a set.
+#   - The old GROUP_CONCAT gave ingredients in no defined order; they now
+#     come in recipe order, so matching/missing lists are compared sorted.
+#   - Before the ingredient dictionary, chat matched LOWER(ingredient)
+#     strings; ids now line up plurals and aliases ("egg" finds "eggs").
+import random
+
+import pytest
+
+from benchmark import generate_recipes, ingredient_vocabulary, zipf_sampler
+from db import get_connection
+from ingredient_dictionary import resolve_ingredient_ids
+from recipe_import import import_recipes
+from recipes_db import find_recipes_by_ingredients
+
+CATALOG_SIZE = 2000
+VOCABULARY_SIZE = 150
+SEED = 5
+
+OLD_QUERY = """
+    SELECT r.id, r.name, r.description, r.instructions,
+           GROUP_CONCAT(ri.ingredient, char(31)) as all_ingredients,
+           GROUP_CONCAT(ri.ingredient_id, char(31)) as all_ingredient_ids,
+           SUM(CASE WHEN ri.ingredient_id IN ({placeholders}) THEN 1 ELSE 0 END) as match_count,
+           COUNT(ri.id) as total_ingredients
+    FROM recipes r
+    JOIN recipe_ingredients ri ON r.id = ri.recipe_id
+    GROUP BY r.id
+    HAVING match_count > 0
+    ORDER BY {order}
+    LIMIT ? OFFSET ?
+"""
+
+@pytest.fixture(scope='module')
+def vocabulary():
+    rng = random.Random(SEED)
+    names = ingredient_vocabulary(VOCABULARY_SIZE)
+    import_recipes(generate_recipes(rng, zipf_sampler(rng, names, 1.1), CATALOG_SIZE))
+    return names
+
+def old_find_recipes(ingredients, limit=5, offset=0, tiebreak=True):
+    """The pre-index chat query, formatted like find_recipes_by_ingredients()."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    ingredient_ids = set(resolve_ingredient_ids(cursor, ingredients, create=False).values())
+    if not ingredient_ids:
+        conn.close()
+        return []
+
+    order = "match_count DESC, total_ingredients ASC"
+    if tiebreak:
+        order += ", r.id"
+    cursor.execute(
+        OLD_QUERY.format(placeholders=','.join(['?'] * len(ingredient_ids)), order=order),
+        list(ingredient_ids) + [limit, offset]
+    )
+    recipes = cursor.fetchall()
+    conn.close()
+
+    formatted_recipes = []
+    for recipe in recipes:
+        pairs = list(zip(recipe['all_ingredients'].split('\x1f'),
+                         map(int, recipe['all_ingredient_ids'].split('\x1f'))))
+        formatted_recipes.append({
+            'id': recipe['id'],
+            'name': recipe['name'],
+            'description': recipe['description'],
+            'matching_ingredients': [name for name, ingredient_id in pairs if ingredient_id in ingredient_ids],
+            'missing_ingredients': [name for name, ingredient_id in pairs if ingredient_id not in ingredient_ids],
+            'match_percentage': round(recipe['match_count'] / recipe['total_ingredients'], 2),
+            'instructions': recipe['instructions'].split('\n') if recipe['instructions'] else []
+        })
+    return formatted_recipes
+
+def comparable(recipes):
+    # Ingredient lists sorted: the old GROUP_CONCAT order was undefined
+    return [
+        dict(recipe,
+             matching_ingredients=sorted(recipe['matching_ingredients']),
+             missing_ingredients=sorted(recipe['missing_ingredients']))
+        for recipe in recipes
+    ]
+
+def pantry_samples(vocabulary, count=40):
+    rng = random.Random(SEED + 1)
+    samples = [rng.sample(vocabulary, rng.randint(1, 8)) for _ in range(count)]
+    # Case and plural spellings resolve to the same ids in both queries
+    samples.append(['SALT', 'egg', 'Chickpea'])
+    samples.append(['tomatoes', 'olive oil', 'no such ingredient'])
+    return samples
+
+def test_matches_old_query(vocabulary):
+    for ingredients in pantry_samples(vocabulary):
+        for limit in (5, 50):
+            assert comparable(find_recipes_by_ingredients(ingredients, limit=limit)) == \
+                comparable(old_find_recipes(ingredients, limit=limit)), ingredients
+
+def test_same_recipes_without_id_tiebreak(vocabulary):
+    for ingredients in pantry_samples(vocabulary):
+        new = find_recipes_by_ingredients(ingredients, limit=CATALOG_SIZE)
+        old = old_find_recipes(ingredients, limit=CATALOG_SIZE, tiebreak=False)
+        # Same recipes, ranked by the same keys; only order within ties may differ
+        assert sorted(recipe['id'] for recipe in new) == sorted(recipe['id'] for recipe in old)
+        assert [(len(r['matching_ingredients']), len(r['missing_ingredients'])) for r in new] == \
+            [(len(r['matching_ingredients']), len(r['missing_ingredients'])) for r in old]
+
+def test_unknown_ingredients_find_nothing(vocabulary):
+    assert find_recipes_by_ingredients(['no such ingredient']) == []
+    assert find_recipes_by_ingredients([]) == []
+
+def test_paging(vocabulary):
+    ingredients = ['salt', 'garlic', 'onion']
+    everything = find_recipes_by_ingredients(ingredients, limit=CATALOG_SIZE)
+    assert len(everything) > 30
+
+    pages = []
+    offset = 0
+    while True:
+        page = find_recipes_by_ingredients(ingredients, limit=7, offset=offset)
+        if not page:
+            break
+        assert len(page) <= 7
+        assert comparable(page) == comparable(old_find_recipes(ingredients, limit=7, offset=offset))
+        pages.extend(page)
+        offset += 7
+    assert pages == everything
+    assert find_recipes_by_ingredients(ingredients, limit=5, offset=len(everything)) == []
+
+def test_plurals_and_aliases_match_by_id(vocabulary):
+    # Recipes list "eggs"; matching LOWER(ingredient) strings, as chat did
+    # before the dictionary, finds nothing for "egg"
+    conn = get_connection()
+    string_matches = conn.execute(
+        "SELECT COUNT(DISTINCT recipe_id) FROM recipe_ingredients WHERE LOWER(ingredient) IN (?)",
+        ('egg',)
+    ).fetchone()[0]
+    id_matches = conn.execute(
+        "SELECT COUNT(DISTINCT recipe_id) FROM recipe_ingredients WHERE LOWER(ingredient) = 'eggs'"
+    ).fetchone()[0]
+    conn.close()
+    assert string_matches == 0
+    assert id_matches > 0
+
+    found = find_recipes_by_ingredients(['egg'], limit=CATALOG_SIZE)
+    assert len(found) == id_matches
+    assert all('eggs' in recipe['matching_ingredients'] for recipe in found)
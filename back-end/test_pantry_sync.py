@@ -0,0 +1,173 @@
+# test_pantry_sync.py
+#
+# Pantry state kept outside the ingredients table: the per-user suggestion
+# state (suggestion_state.py), the write-behind buffer for toggles
+# (write_behind.py) and the change log behind /api/ingredients/changes.
+import pytest
+
+import ingredients_db
+import write_behind
+from db import get_connection
+from ingredient_dictionary import resolve_ingredient_ids
+from ingredients_db import (
+    add_ingredients, compact_all_pantry_changes, get_ingredients, get_pantry_changes,
+    remove_ingredient, update_ingredient_status
+)
+from recipe_import import import_recipes
+from recipes_db import get_recipe_suggestions
+
+SYNC_RECIPES = {
+    'sync-1': ['sync kale', 'sync quinoa'],
+    'sync-2': ['sync kale', 'sync tahini', 'sync sumac'],
+}
+
+@pytest.fixture(scope='module')
+def catalog():
+    import_recipes(
+        {
+            'external_id': external_id,
+            'name': f"Recipe {external_id}",
+            'description': None,
+            'preparation_time': None,
+            'cooking_time': None,
+            'servings': None,
+            'difficulty': None,
+            'image_url': None,
+            'instructions': 'Mix',
+            'ingredients': [(name, None, None) for name in ingredients],
+        }
+        for external_id, ingredients in SYNC_RECIPES.items()
+    )
+
+@pytest.fixture
+def buffered(monkeypatch):
+    # Long interval: only the test decides when buffered toggles are written
+    monkeypatch.setattr(write_behind, 'WRITE_BEHIND_MS', 60000)
+    yield
+    monkeypatch.setattr(write_behind, '_writer', ingredients_db._flush_statuses)
+    write_behind.flush()
+
+def suggestions(username):
+    recipes, _ = get_recipe_suggestions(username, ingredient_match_threshold=0.5)
+    return {
+        recipe['name']: sorted(recipe['matching_ingredients'])
+        for recipe in recipes if recipe['name'].startswith('Recipe sync-')
+    }
+
+def checked(username):
+    return {item['name']: item['checked'] for item in get_ingredients(username)}
+
+def test_suggest_sees_pantry_edits(catalog, add_user):
+    username = add_user('sync_edits')
+    add_ingredients(username, [('sync kale', False), ('sync quinoa', False)])
+    assert suggestions(username) == {'Recipe sync-1': ['sync kale', 'sync quinoa']}
+
+    remove_ingredient(username, 'sync quinoa')
+    assert suggestions(username) == {'Recipe sync-1': ['sync kale']}
+
+    # Written by another process: picked up through the shared change log
+    conn = get_connection()
+    cursor = conn.cursor()
+    ingredient_ids = resolve_ingredient_ids(cursor, ['sync tahini'])
+    cursor.execute(
+        "INSERT INTO ingredients (username, name, checked, ingredient_id) VALUES (?, ?, 0, ?)",
+        (username, 'sync tahini', ingredient_ids['sync tahini'])
+    )
+    conn.commit()
+    conn.close()
+    assert suggestions(username) == {
+        'Recipe sync-1': ['sync kale'],
+        'Recipe sync-2': ['sync kale', 'sync tahini'],
+    }
+
+def test_toggle_then_suggest_sees_new_state(catalog, add_user, buffered):
+    username = add_user('sync_toggle')
+    add_ingredients(username, [('sync kale', False), ('sync quinoa', False)])
+    before = suggestions(username)
+
+    update_ingredient_status(username, [('sync kale', True)])
+    assert write_behind.pending(username) == {'sync kale': True}
+    # Reads overlay the buffered toggle; matching ignores the checked flag
+    assert checked(username) == {'sync kale': True, 'sync quinoa': False}
+    assert suggestions(username) == before
+
+    # A pantry write lands buffered toggles first, and suggest follows it
+    remove_ingredient(username, 'sync quinoa')
+    assert write_behind.pending(username) == {}
+    assert checked(username) == {'sync kale': True}
+    assert suggestions(username) == {'Recipe sync-1': ['sync kale']}
+
+def test_failed_flush_requeues_writes(add_user, buffered, monkeypatch):
+    username = add_user('sync_flush')
+    add_ingredients(username, [('sync kale', False), ('sync quinoa', False)])
+    update_ingredient_status(username, [('sync kale', True), ('sync quinoa', True)])
+
+    def failing_writer(batch):
+        # A toggle arriving while the batch is being written
+        write_behind.enqueue(username, {'sync quinoa': False})
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(write_behind, '_writer', failing_writer)
+    with pytest.raises(RuntimeError):
+        write_behind.flush()
+
+    # The failed batch is queued again, behind the newer toggle
+    assert write_behind.pending(username) == {'sync kale': True, 'sync quinoa': False}
+    assert checked(username) == {'sync kale': True, 'sync quinoa': False}
+
+    monkeypatch.setattr(write_behind, '_writer', ingredients_db._flush_statuses)
+    write_behind.flush()
+    assert write_behind.pending(username) == {}
+    conn = get_connection()
+    rows = conn.execute("SELECT name, checked FROM ingredients WHERE username = ?", (username,)).fetchall()
+    conn.close()
+    assert {row['name']: bool(row['checked']) for row in rows} == {'sync kale': True, 'sync quinoa': False}
+
+def test_changes_since_version(add_user):
+    username = add_user('sync_changes')
+    add_ingredients(username, [('sync kale', False), ('sync quinoa', False)])
+    since = get_pantry_changes(username, 0)['version']
+
+    update_ingredient_status(username, [('sync kale', True)])
+    remove_ingredient(username, 'sync quinoa')
+    result = get_pantry_changes(username, since)
+    assert result['reset'] is False
+    assert [(change['name'], change.get('checked'), change.get('deleted', False))
+            for change in result['changes']] == [('sync kale', True, False), ('sync quinoa', None, True)]
+
+    assert get_pantry_changes(username, result['version']) == \
+        {'version': result['version'], 'reset': False, 'changes': []}
+    # A version the server never handed out
+    assert get_pantry_changes(username, result['version'] + 1)['reset'] is True
+
+def test_changes_after_compaction_resync(add_user):
+    username = add_user('sync_compaction')
+    add_ingredients(username, [('sync kale', False), ('sync quinoa', False), ('sync sumac', False)])
+    since = get_pantry_changes(username, 0)['version']
+    update_ingredient_status(username, [('sync kale', True)])
+    update_ingredient_status(username, [('sync kale', False)])
+    remove_ingredient(username, 'sync quinoa')
+
+    # Dropping superseded entries alone keeps deltas from any version valid
+    compact_all_pantry_changes()
+    result = get_pantry_changes(username, since)
+    assert result['reset'] is False
+    assert {change['name']: change.get('deleted', False) for change in result['changes']} == \
+        {'sync kale': False, 'sync quinoa': True}
+
+    # Once the tombstone is past retention it is dropped, and a client that
+    # never saw it must start over instead of keeping the deleted item
+    conn = get_connection()
+    conn.execute(
+        "UPDATE pantry_changes SET changed_at = datetime('now', ?) WHERE username = ? AND deleted = 1",
+        (f"-{ingredients_db.TOMBSTONE_RETENTION_DAYS + 1} days", username)
+    )
+    conn.commit()
+    conn.close()
+    compact_all_pantry_changes()
+
+    result = get_pantry_changes(username, since)
+    assert result['reset'] is True
+    assert {change['name']: change['checked'] for change in result['changes']} == \
+        {'sync kale': False, 'sync sumac': False}
+    assert not any(change.get('deleted') for change in result['changes'])
@@ -0,0 +1,161 @@
+# write_behind.py
+#
+# Write-behind buffer for pantry checkbox toggles. With
+# FOOD_PLANNER_WRITE_BEHIND_MS set, status updates are kept in memory,
+# coalesced per (username, name), and written by a background thread in one
+# transaction every FOOD_PLANNER_WRITE_BEHIND_MS milliseconds, or as soon as
+# FOOD_PLANNER_WRITE_BEHIND_MAX_PENDING updates are waiting. A burst of
+# clicks then costs one commit instead of one per click.
+#
+# Pending updates are overlaid on pantry reads in the same process, and are
+# written out at interpreter exit and before any other pantry write for the
+# same user.
+#
+# Read-your-writes only holds within one process. Each process has its own
+# buffer, so with several gunicorn workers a GET served by another worker can
+# show the old value for up to FOOD_PLANNER_WRITE_BEHIND_MS. Run a single
+# worker (FOOD_PLANNER_WORKERS=1, with threads for concurrency) when clients
+# must always see their own toggles.
+import atexit
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Flush interval in milliseconds; 0 writes every update immediately
+WRITE_BEHIND_MS = int(os.environ.get('FOOD_PLANNER_WRITE_BEHIND_MS', '0'))
+
+# Flush early once this many (username, name) updates are waiting
+MAX_PENDING = int(os.environ.get('FOOD_PLANNER_WRITE_BEHIND_MAX_PENDING', '1000'))
+
+# Called as writer({username: {name: checked}}); writes everything in one
+# transaction. Installed by ingredients_db.
+_writer = None
+
+_lock = threading.Lock()
+# Serializes flushes so an older batch can never commit after a newer one
+_flush_lock = threading.Lock()
+# username -> {name: checked} not yet handed to the writer
+_pending = {}
+_pending_count = 0
+# Batch currently being written; still overlaid on reads until committed
+_flushing = {}
+_thread = None
+_stopped = threading.Event()
+# Set to make the flush thread write before its interval is up
+_wake = threading.Event()
+
+def enabled():
+    return WRITE_BEHIND_MS > 0
+
+def set_writer(writer):
+    global _writer
+    _writer = writer
+
+def enqueue(username, statuses):
+    """
+    Buffer checked flags for a user's pantry items.
+
+    Args:
+        username: Owner of the pantry
+        statuses: Dict of name -> checked; later calls win
+    """
+    global _pending_count
+    with _lock:
+        user_pending = _pending.setdefault(username, {})
+        before = len(user_pending)
+        user_pending.update(statuses)
+        _pending_count += len(user_pending) - before
+        _start_thread_locked()
+        if _pending_count >= MAX_PENDING:
+            # Written by the flush thread: the update is already accepted, so
+            # a failing write must not fail the caller's request
+            _wake.set()
+
+def pending(username):
+    """Buffered and in-flight statuses of a user's items, as {name: checked}."""
+    with _lock:
+        if username not in _pending and username not in _flushing:
+            return {}
+        statuses = dict(_flushing.get(username, {}))
+        statuses.update(_pending.get(username, {}))
+        return statuses
+
+def flush(username=None):
+    """
+    Write buffered statuses now.
+
+    Args:
+        username: Only flush this user's updates (None for everyone)
+    """
+    global _pending, _pending_count, _flushing
+    with _flush_lock:
+        with _lock:
+            if username is None:
+                batch, _pending, _pending_count = _pending, {}, 0
+            elif username in _pending:
+                batch = {username: _pending.pop(username)}
+                _pending_count -= len(batch[username])
+            else:
+                return
+            if not batch:
+                return
+            _flushing = batch
+
+        try:
+            _writer(batch)
+        except Exception:
+            # Put the batch back behind anything queued since, and retry later
+            with _lock:
+                for user, statuses in batch.items():
+                    user_pending = _pending.setdefault(user, {})
+                    for name, checked in statuses.items():
+                        if name not in user_pending:
+                            user_pending[name] = checked
+                            _pending_count += 1
+            raise
+        finally:
+            with _lock:
+                _flushing = {}
+
+def _run():
+    interval = WRITE_BEHIND_MS / 1000
+    while not _stopped.is_set():
+        _wake.wait(interval)
+        _wake.clear()
+        if _stopped.is_set():
+            # shutdown() writes what is left
+            break
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Write-behind flush failed: {e}", exc_info=True)
+
+def _start_thread_locked():
+    global _thread
+    if _thread is None:
+        _thread = threading.Thread(target=_run, name='write-behind', daemon=True)
+        _thread.start()
+
+def shutdown():
+    """Stop the flush thread and write everything still buffered."""
+    _stopped.set()
+    _wake.set()
+    flush()
+
+def _reset_after_fork():
+    # The flush thread does not survive fork(); a child starts its own on
+    # its first update. Updates buffered by the parent stay the parent's.
+    global _lock, _flush_lock, _pending, _pending_count, _flushing, _thread, _stopped, _wake
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _pending = {}
+    _pending_count = 0
+    _flushing = {}
+    _thread = None
+    _stopped = threading.Event()
+    _wake = threading.Event()
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(shutdown)
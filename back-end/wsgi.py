@@ -0,0 +1,22 @@
+# wsgi.py
+#
+# Production entry point:
+#
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#
+# gunicorn.conf.py sets preload_app, so this module is imported once in the
+# gunicorn master: migrations, catalog seeding and the recipe index build
+# run there, and every worker forks with the warmed-up state.
+import gc
+
+from backend import create_app
+from db import close_all
+
+app = create_app()
+
+# SQLite connections must not be shared across fork(); workers open their own
+close_all()
+
+# Move everything allocated so far out of the garbage collector's reach so
+# collections in the workers do not touch (and copy) the shared pages
+gc.freeze()
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useAuth } from '../../context/AuthContext';
 
 function IngredientList() {
@@ -6,30 +6,74 @@ function IngredientList() {
   const [newIngredient, setNewIngredient] = useState('');
   const [errorMessage, setErrorMessage] = useState('');
   const [isLoading, setIsLoading] = useState(true);
+  const [suggestions, setSuggestions] = useState([]);
   const { user, isAuthenticated } = useAuth();
+  // Pantry version the local list is synced to
+  const versionRef = useRef(0);
+  // Latest prefix sent for autocomplete; older responses are dropped
+  const prefixRef = useRef('');
 
   // Fetch ingredients when component mounts or user changes
   useEffect(() => {
     if (user?.username) {
-      fetchIngredients(user.username);
+      versionRef.current = 0;
+      setIsLoading(true);
+      syncIngredients(user.username).finally(() => setIsLoading(false));
     }
   }, [user]);
 
-  const fetchIngredients = async (username) => {
-    setIsLoading(true);
+  // Apply a changes response to the local list (newest first, like /api/ingredients)
+  const applyChanges = (current, data) => {
+    const byId = new Map(data.reset ? [] : current.map((ingredient) => [ingredient.id, ingredient]));
+    data.changes.forEach((change) => {
+      if (change.deleted) {
+        byId.delete(change.id);
+      } else {
+        byId.set(change.id, { id: change.id, name: change.name, checked: change.checked });
+      }
+    });
+    return [...byId.values()].sort((a, b) => b.id - a.id);
+  };
+
+  // Download only what changed since the last sync
+  const syncIngredients = async (username) => {
     try {
-      const response = await fetch(`http://localhost:5000/api/ingredients?username=${username}`);
+      const response = await fetch(
+        `http://localhost:5000/api/ingredients/changes?username=${encodeURIComponent(username)}&since=${versionRef.current}`
+      );
       if (response.ok) {
         const data = await response.json();
-        setIngredients(data.ingredients || []);
+        versionRef.current = data.version;
+        setIngredients((current) => applyChanges(current, data));
       } else {
         setErrorMessage('Failed to load ingredients');
       }
     } catch (error) {
       setErrorMessage('Error connecting to server');
       console.error('Error fetching ingredients:', error);
-    } finally {
-      setIsLoading(false);
+    }
+  };
+
+  // Suggest catalog ingredient names for what has been typed so far
+  const updateNewIngredient = async (value) => {
+    setNewIngredient(value);
+    const prefix = value.trim();
+    prefixRef.current = prefix;
+    if (!prefix) {
+      setSuggestions([]);
+      return;
+    }
+
+    try {
+      const response = await fetch(
+        `http://localhost:5000/api/ingredients/autocomplete?prefix=${encodeURIComponent(prefix)}&limit=8`
+      );
+      if (response.ok && prefixRef.current === prefix) {
+        const data = await response.json();
+        setSuggestions(data.suggestions.map((suggestion) => suggestion.name));
+      }
+    } catch (error) {
+      console.error('Error fetching suggestions:', error);
     }
   };
 
@@ -45,14 +89,15 @@ function IngredientList() {
         },
         body: JSON.stringify({
           username: user.username,
-          ingredients: [newIngredient]
+          ingredients: [newIngredient],
+          only_changed: true
         })
       });
       
       if (response.ok) {
-        const data = await response.json();
-        setIngredients(data.ingredients);
+        await syncIngredients(user.username);
         setNewIngredient('');
+        setSuggestions([]);
       } else {
         setErrorMessage('Failed to add ingredient');
       }
@@ -92,7 +137,7 @@ function IngredientList() {
         },
         body: JSON.stringify({
           username: user.username,
-          ingredients: updatedIngredients
+          ingredients: [updatedIngredients[index]]
         })
       });
     } catch (error) {
@@ -152,10 +197,16 @@ function IngredientList() {
           <input
             type="text"
             value={newIngredient}
-            onChange={(e) => setNewIngredient(e.target.value)}
+            onChange={(e) => updateNewIngredient(e.target.value)}
             placeholder="Add new ingredient"
             className="input-field ingredient-input"
+            list="ingredient-suggestions"
           />
+          <datalist id="ingredient-suggestions">
+            {suggestions.map((suggestion) => (
+              <option key={suggestion} value={suggestion} />
+            ))}
+          </datalist>
           <button 
             type="submit" 
             className="btn-primary ingredient-add-btn"
@@ -36,6 +36,14 @@ function RecipeChat() {
       const data = await response.json();
       if (response.ok) {
         setRecipes(data.recipes || []);
+        loadFavoriteStatuses(data.recipes || []);
+        const corrections = Object.entries(data.corrections || {});
+        if (corrections.length > 0) {
+          setMessages(prev => [...prev, {
+            text: `I searched for ${corrections.map(([typed, name]) => `"${name}" instead of "${typed}"`).join(', ')}.`,
+            sender: 'bot'
+          }]);
+        }
         if (data.recipes?.length > 0) {
           setMessages(prev => [...prev, {
             text: `I found ${data.recipes.length} recipe(s) you can make!`,
@@ -63,6 +71,30 @@ function RecipeChat() {
     }
   };
   
+  const loadFavoriteStatuses = async (recipeList) => {
+    if (!user?.username || recipeList.length === 0) return;
+
+    try {
+      const ids = recipeList.map(recipe => recipe.id).join(',');
+      const response = await fetch(
+        `http://localhost:5000/api/recipes/favorites/status?username=${encodeURIComponent(user.username)}&ids=${ids}`
+      );
+
+      if (response.ok) {
+        const data = await response.json();
+        setFavoriteIds(prev => {
+          const updated = new Set(prev);
+          Object.entries(data.favorites || {}).forEach(([id, isFav]) => {
+            isFav ? updated.add(Number(id)) : updated.delete(Number(id));
+          });
+          return updated;
+        });
+      }
+    } catch (error) {
+      console.error("Error loading favorite statuses:", error);
+    }
+  };
+
   const toggleFavorite = async (recipeId) => {
     if (!user?.username) return;
   
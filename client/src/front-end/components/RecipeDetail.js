@@ -45,12 +45,13 @@ function RecipeDetail() {
 
   const checkIfFavorite = async (username, recipeId) => {
     try {
-      const response = await fetch(`http://localhost:5000/api/recipes/favorites?username=${username}`)
+      const response = await fetch(
+        `http://localhost:5000/api/recipes/${recipeId}/favorite?username=${encodeURIComponent(username)}`
+      )
 
       if (response.ok) {
         const data = await response.json()
-        const favorites = data.recipes || []
-        setIsFavorite(favorites.some((fav) => fav.id === Number.parseInt(recipeId)))
+        setIsFavorite(data.favorite)
       }
     } catch (err) {
       console.error("Error checking favorite status:", err)